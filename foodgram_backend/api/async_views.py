@@ -0,0 +1,156 @@
+'''
+Async-версии маршрутов чтения для запуска под ASGI.
+'''
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+from django.db import close_old_connections, connections
+from django.urls import URLPattern
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+ASYNC_ROUTES = (
+    'tags-list',
+    'ingredients-list',
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download-shopping-cart',
+)
+
+
+class ThreadedStream:
+    """
+    Async-итератор по частям потокового ответа.
+
+    Каждая часть читается в отдельном потоке, одном на весь ответ: так
+    запросы к БД в итераторе идут через одно соединение, не блокируют
+    цикл событий, а ответ не собирается в памяти целиком.
+    """
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        part = await self.run(next, self.iterator, None)
+        if part is None:
+            await self.aclose()
+            raise StopAsyncIteration
+        return part
+
+    def run(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(
+            self.executor, function, *args
+        )
+
+    async def aclose(self):
+        if self.executor is None:
+            return
+        await self.run(connections.close_all)
+        self.executor.shutdown(wait=False)
+        self.executor = None
+
+
+def run_view(view, request, *args, **kwargs):
+    """
+    Выполняет представление и готовит ответ к отправке.
+
+    Ответ рендерится здесь же. Потоковый ответ ASGIHandler перебирает
+    в цикле событий, где запросы к БД запрещены, поэтому его части
+    читаются через ThreadedStream.
+    """
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    if response.streaming:
+        response.async_streaming_content = ThreadedStream(
+            iter(response.streaming_content)
+        )
+    return response
+
+
+def run_in_thread(view, request, *args, **kwargs):
+    """run_view в потоке пула со своим соединением с БД."""
+    close_old_connections()
+    try:
+        return run_view(view, request, *args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """
+    Async-обертка над синхронным представлением.
+
+    Синхронные представления под ASGI выполняются по очереди в одном
+    общем потоке. Безопасные запросы обертка отправляет в пул потоков,
+    и медленные запросы не задерживают остальные; запросы на изменение
+    по-прежнему выполняются в общем потоке.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await sync_to_async(run_in_thread, thread_sensitive=False)(
+                view, request, *args, **kwargs
+            )
+        return await sync_to_async(run_view)(view, request, *args, **kwargs)
+    return wrapper
+
+
+def async_patterns(patterns, names=ASYNC_ROUTES):
+    """Копия списка маршрутов, где маршруты names обернуты async_view."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        ) if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    ASGIHandler, который отправляет async_streaming_content ответа
+    по частям, ожидая каждую, вместо синхронного перебора в цикле событий.
+    """
+
+    async def send_response(self, response, send):
+        stream = getattr(response, 'async_streaming_content', None)
+        if stream is None:
+            return await super().send_response(response, send)
+        response_headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ]
+        for cookie in response.cookies.values():
+            response_headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip(),
+            ))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+        try:
+            async for part in stream:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+        finally:
+            await stream.aclose()
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
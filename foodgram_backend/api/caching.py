@@ -0,0 +1,149 @@
+'''
+Кэш готовых ответов: справочники (теги, ингредиенты) и рецепты
+для анонимных пользователей.
+'''
+
+import gzip
+import hashlib
+import json
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from .renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TAGS_CACHE_KEY = 'reference:tags'
+INGREDIENTS_CACHE_KEY = 'reference:ingredients'
+
+ACCEPTS_BR = re.compile(r'\bbr\b')
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def get_reference_data(key, build):
+    """
+    Закэшированное JSON-представление справочника.
+
+    build вызывается только при пустом кэше и должен вернуть данные
+    сериализатора. Вместе с телом хранятся его сжатые версии и ETag,
+    вычисленный по содержимому. Запись живет REFERENCE_CACHE_TIMEOUT
+    секунд: так изменения, о которых процесс не узнал (например, из
+    другого процесса при кэше в памяти), не остаются в ответах навсегда.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        body = JSONRenderer().render(build())
+        entry = {
+            'etag': f'"{hashlib.sha1(body).hexdigest()}"',
+            'identity': body,
+            'gzip': gzip.compress(body),
+            'br': brotli.compress(body) if brotli else None,
+        }
+        cache.set(key, entry, settings.REFERENCE_CACHE_TIMEOUT)
+    return entry
+
+
+def reference_response(request, entry):
+    """
+    Ответ из кэша с учетом If-None-Match и Accept-Encoding.
+
+    Сжатые тела — разные представления, поэтому у каждого свой строгий
+    ETag: к хэшу содержимого добавляется кодировка.
+    """
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if entry['br'] is not None and ACCEPTS_BR.search(accept_encoding):
+        encoding = 'br'
+    elif ACCEPTS_GZIP.search(accept_encoding):
+        encoding = 'gzip'
+    else:
+        encoding = 'identity'
+    etag = entry['etag']
+    response = HttpResponse(entry[encoding], content_type='application/json')
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+        etag = f'{etag[:-1]}-{encoding}"'
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def invalidate_reference_data(key):
+    cache.delete(key)
+
+
+ANONYMOUS_PARAMS = (
+    'author', 'cursor', 'fields', 'is_favorited', 'is_in_shopping_cart',
+    'limit', 'ordering', 'page', 'pagination', 'search', 'tags',
+)
+LIST_SCOPE = 'list'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def recipe_scope(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def get_versions(scopes):
+    """
+    Текущие версии областей кэша ответов.
+
+    Отсутствующая версия (новая, истекшая или вытесненная из кэша)
+    начинается с текущего времени, чтобы не совпасть ни с одной
+    прежней. Версия живет не дольше ответов, которые от нее зависят.
+    """
+    keys = [f'anonymous:version:{scope}' for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), settings.ANONYMOUS_CACHE_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(scopes):
+    for scope in scopes:
+        key = f'anonymous:version:{scope}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), settings.ANONYMOUS_CACHE_TIMEOUT)
+
+
+def get_anonymous_cache_key(request, scopes):
+    """
+    Ключ ответа анониму: адрес, значимые параметры запроса и версии
+    областей, от которых зависит ответ.
+    """
+    params = sorted(
+        (name, sorted(request.query_params.getlist(name)))
+        for name in ANONYMOUS_PARAMS if name in request.query_params
+    )
+    signature = json.dumps(
+        [request.get_host(), request.path, params, get_versions(scopes)]
+    )
+    return f'anonymous:{hashlib.sha1(signature.encode()).hexdigest()}'
+
+
+def invalidate_recipes(recipe_ids, author_ids):
+    """
+    Сбрасывает ответы анонимам, в которые входят данные рецептов.
+
+    Удаляются детальные ответы этих рецептов, списки их авторов
+    и общие списки; списки других авторов остаются в кэше.
+    """
+    bump_versions(
+        [LIST_SCOPE]
+        + [recipe_scope(pk) for pk in recipe_ids]
+        + [author_scope(pk) for pk in author_ids]
+    )
@@ -1,4 +1,3 @@
-from rest_framework.filters import SearchFilter
 import django_filters
 from django.contrib.auth import get_user_model
 
@@ -7,12 +6,6 @@ from recipes.models import Recipe, Tag
 User = get_user_model()
 
 
-class IngredientSearchFilter(SearchFilter):
-    """Фильтрация названий ингредиентов."""
-
-    search_param = 'name'
-
-
 class RecipeFilter(django_filters.FilterSet):
     tags = django_filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
@@ -20,7 +13,18 @@ class RecipeFilter(django_filters.FilterSet):
         queryset=Tag.objects.all(),
     )
     author = django_filters.ModelChoiceFilter(queryset=User.objects.all())
+    search = django_filters.CharFilter(method='filter_search')
+    ordering = django_filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author')
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.popular()
@@ -0,0 +1,105 @@
+'''
+Management-команда на сравнение JSON-рендереров и парсеров.
+'''
+
+import io
+import timeit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework import parsers, renderers
+from rest_framework.request import Request
+
+from api.parsers import JSONParser
+from api.renderers import JSONRenderer, orjson
+from api.serializers import RecipeListSerializer
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Скорость стандартного и быстрого JSON на страницах '
+        'списка рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size', type=int,
+            default=settings.REST_FRAMEWORK['PAGE_SIZE'],
+        )
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--number', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--host', default='127.0.0.1',
+            help='Хост для абсолютных адресов изображений.',
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write(
+                'orjson не установлен: быстрый рендерер использует json.'
+            )
+        pages = self.get_pages(
+            options['host'], options['page_size'], options['pages']
+        )
+        contents = [
+            renderers.JSONRenderer().render(page) for page in pages
+        ]
+        if contents != [JSONRenderer().render(page) for page in pages]:
+            raise CommandError('Рендереры выдают разные ответы.')
+        self.stdout.write(
+            f'Страниц: {len(pages)}, рецептов на странице: '
+            f'{options["page_size"]}, '
+            f'средний размер: {sum(map(len, contents)) // len(contents)} Б.'
+        )
+        for operation, run, standard, fast in (
+            ('render', lambda renderer: [
+                renderer.render(page) for page in pages
+            ], renderers.JSONRenderer(), JSONRenderer()),
+            ('parse', lambda parser: [
+                parser.parse(io.BytesIO(content)) for content in contents
+            ], parsers.JSONParser(), JSONParser()),
+        ):
+            standard_time, fast_time = (
+                min(timeit.repeat(
+                    lambda: run(instance),
+                    number=options['number'],
+                    repeat=options['repeat'],
+                )) / options['number'] / len(pages)
+                for instance in (standard, fast)
+            )
+            self.stdout.write(
+                f'{operation}: json {standard_time * 1e6:.0f} мкс, '
+                f'быстрый {fast_time * 1e6:.0f} мкс на страницу, '
+                f'ускорение в {standard_time / fast_time:.1f} раза.'
+            )
+
+    def get_pages(self, host, page_size, count):
+        """Данные страниц списка рецептов, как их отдает API анониму."""
+        request = Request(
+            RequestFactory().get('/api/recipes/', HTTP_HOST=host)
+        )
+        request.user = AnonymousUser()
+        recipes = list(Recipe.objects.for_list(request.user).order_by(
+            '-pub_date', '-id'
+        )[:page_size * count])
+        if not recipes:
+            raise CommandError(
+                'Рецептов нет: сначала выполните generate_data.'
+            )
+        return [
+            {
+                'count': len(recipes),
+                'next': None,
+                'previous': None,
+                'results': RecipeListSerializer(
+                    recipes[start:start + page_size],
+                    many=True,
+                    context={'request': request},
+                ).data,
+            }
+            for start in range(0, len(recipes), page_size)
+        ]
@@ -0,0 +1,379 @@
+'''
+Метрики запросов в текстовом формате Prometheus.
+
+Каждый процесс копит метрики в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сохраняет их в собственный файл
+в METRICS_DIR. Адрес /metrics суммирует файлы всех процессов, поэтому
+в ответе видны все воркеры gunicorn, в том числе перезапущенные.
+Файлы завершившихся процессов сливаются в один (prune_exited), чтобы
+их число не росло с каждым перезапуском воркера. Все метрики —
+счетчики и гистограммы, поэтому значения завершившихся процессов
+остаются в сумме. METRICS_DIR не должен быть общим для контейнеров:
+процессы проверяются по pid.
+'''
+
+import atexit
+import bisect
+import fcntl
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import serializers
+
+from .middleware import request_middleware
+
+REQUEST_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'foodgram_request_duration_seconds': (
+        'histogram', 'Время ответа по маршрутам.'
+    ),
+    'foodgram_request_db_queries': (
+        'histogram', 'Число запросов к БД на один ответ.'
+    ),
+    'foodgram_db_query_duration_seconds_total': (
+        'counter', 'Суммарное время запросов к БД.'
+    ),
+    'foodgram_serializer_duration_seconds_total': (
+        'counter', 'Суммарное время to_representation сериализаторов.'
+    ),
+}
+BUCKETS = {
+    'foodgram_request_duration_seconds': REQUEST_BUCKETS,
+    'foodgram_request_db_queries': QUERY_BUCKETS,
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+current_stats = ContextVar('metrics_request_stats', default=None)
+
+
+class RequestStats:
+    """Запросы к БД и сериализация в рамках одного ответа."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = defaultdict(float)
+        self.serializing = False
+
+
+class Registry:
+    """Метрики текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.filename = f'{self.pid}-{uuid.uuid4().hex}.json'
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed_at = time.monotonic()
+        self.pruned = False
+
+    def inc(self, name, labels, value):
+        self.counters[name, labels] += value
+
+    def observe(self, name, labels, value):
+        buckets = BUCKETS[name]
+        key = name, labels
+        if key not in self.histograms:
+            self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        histogram = self.histograms[key]
+        histogram[bisect.bisect_left(buckets, value)] += 1
+        histogram[-1] += value
+
+    def record(self, route, method, status, duration, stats):
+        labels = (('view', route), ('method', method))
+        with self.lock:
+            if os.getpid() != self.pid:
+                self.reset()
+            self.observe(
+                'foodgram_request_duration_seconds',
+                labels + (('status', str(status)),),
+                duration,
+            )
+            self.observe('foodgram_request_db_queries', labels, stats.queries)
+            self.inc(
+                'foodgram_db_query_duration_seconds_total',
+                labels, stats.query_time,
+            )
+            for serializer, spent in stats.serializer_time.items():
+                self.inc(
+                    'foodgram_serializer_duration_seconds_total',
+                    labels + (('serializer', serializer),), spent,
+                )
+        if time.monotonic() - self.flushed_at >= (
+            settings.METRICS_FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Атомарно перезаписывает файл метрик процесса. Перед первой
+        записью процесс сливает файлы завершившихся процессов.
+        """
+        with self.lock:
+            if os.getpid() != self.pid:
+                return
+            counters = dict(self.counters)
+            histograms = {
+                key: list(values) for key, values in self.histograms.items()
+            }
+            self.flushed_at = time.monotonic()
+            pruned, self.pruned = self.pruned, True
+        if not pruned:
+            prune_exited()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        write_metrics(self.filename, counters, histograms)
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+EXITED_FILENAME = 'exited.json'
+LOCK_FILENAME = 'metrics.lock'
+
+
+@contextmanager
+def locked_metrics_dir(operation):
+    """
+    Блокировка каталога метрик: слияние файлов (LOCK_EX) не пересекается
+    с чтением (LOCK_SH), иначе /metrics мог бы учесть файл дважды.
+    """
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    with open(os.path.join(settings.METRICS_DIR, LOCK_FILENAME), 'a') as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def write_metrics(filename, counters, histograms):
+    path = os.path.join(settings.METRICS_DIR, filename)
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump({
+            'counters': [
+                [name, labels, value]
+                for (name, labels), value in counters.items()
+            ],
+            'histograms': [
+                [name, labels, values]
+                for (name, labels), values in histograms.items()
+            ],
+        }, file)
+    os.replace(f'{path}.tmp', path)
+
+
+def read_metrics(filenames):
+    """Сумма метрик из файлов каталога METRICS_DIR."""
+    counters = defaultdict(float)
+    histograms = {}
+    for filename in filenames:
+        try:
+            with open(os.path.join(settings.METRICS_DIR, filename)) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, values in data['histograms']:
+            key = name, tuple(map(tuple, labels))
+            if key in histograms:
+                histograms[key] = [
+                    total + value
+                    for total, value in zip(histograms[key], values)
+                ]
+            else:
+                histograms[key] = values
+    return counters, histograms
+
+
+def list_metrics_files():
+    try:
+        names = os.listdir(settings.METRICS_DIR)
+    except FileNotFoundError:
+        return []
+    return [name for name in names if name.endswith('.json')]
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def prune_exited():
+    """
+    Сливает файлы метрик завершившихся процессов в EXITED_FILENAME.
+
+    Вызывается при первой записи метрик процесса и из хука child_exit
+    gunicorn (gunicorn.conf.py).
+    """
+    with locked_metrics_dir(fcntl.LOCK_EX):
+        exited = []
+        for filename in list_metrics_files():
+            pid = filename.split('-', 1)[0]
+            if pid.isdigit() and not is_running(int(pid)):
+                exited.append(filename)
+        if not exited:
+            return
+        write_metrics(
+            EXITED_FILENAME, *read_metrics([EXITED_FILENAME] + exited)
+        )
+        for filename in exited:
+            os.remove(os.path.join(settings.METRICS_DIR, filename))
+
+
+def collect():
+    """Сумма метрик из файлов всех процессов."""
+    with locked_metrics_dir(fcntl.LOCK_SH):
+        return read_metrics(list_metrics_files())
+
+
+def format_labels(labels):
+    return '{%s}' % ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace(
+            '"', '\\"'
+        ).replace('\n', '\\n'))
+        for name, value in labels
+    )
+
+
+def render_metrics():
+    counters, histograms = collect()
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+        if metric_type == 'counter':
+            lines += [
+                f'{name}{format_labels(labels)} {value}'
+                for (metric, labels), value in sorted(counters.items())
+                if metric == name
+            ]
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            *counts, total = values
+            cumulative = 0
+            for bound, count in zip(BUCKETS[name] + ('+Inf',), counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket'
+                    f'{format_labels(labels + (("le", bound),))} {cumulative}'
+                )
+            lines += [
+                f'{name}_sum{format_labels(labels)} {total}',
+                f'{name}_count{format_labels(labels)} {cumulative}',
+            ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Метрики всех процессов для Prometheus.
+
+    Адрес не проксируется nginx и доступен только внутри сети
+    контейнеров.
+    """
+    registry.flush()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
+
+
+def get_route(request):
+    """Метка маршрута: класс и действие вьюсета или имя адреса."""
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - start
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """Обработчик connection_created: учет запросов нового соединения."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_representation(to_representation):
+    """Учитывает время сериализатора верхнего уровня, без вложенных."""
+    @functools.wraps(to_representation)
+    def wrapper(self, instance):
+        stats = current_stats.get()
+        if stats is None or stats.serializing:
+            return to_representation(self, instance)
+        stats.serializing = True
+        start = time.perf_counter()
+        try:
+            return to_representation(self, instance)
+        finally:
+            stats.serializing = False
+            serializer = getattr(self, 'child', self)
+            stats.serializer_time[type(serializer).__name__] += (
+                time.perf_counter() - start
+            )
+    return wrapper
+
+
+def instrument_serializers():
+    for serializer_class in (serializers.Serializer,
+                             serializers.ListSerializer):
+        serializer_class.to_representation = timed_representation(
+            serializer_class.to_representation
+        )
+
+
+def record_response(request, start, stats, response):
+    registry.record(
+        get_route(request), request.method, response.status_code,
+        time.perf_counter() - start, stats,
+    )
+    return response
+
+
+@request_middleware
+@contextmanager
+def metrics_middleware(request):
+    """Время ответа, запросы к БД и время сериализации по маршрутам."""
+    stats = RequestStats()
+    token = current_stats.set(stats)
+    start = time.perf_counter()
+    try:
+        yield functools.partial(record_response, request, start, stats)
+    finally:
+        current_stats.reset(token)
@@ -0,0 +1,35 @@
+'''
+Middleware, работающие и в синхронном, и в асинхронном стеке.
+'''
+
+import asyncio
+import functools
+
+from django.utils.decorators import sync_and_async_middleware
+
+
+def request_middleware(scope):
+    """
+    Делает middleware из scope(request) — контекстного менеджера вокруг
+    обработки запроса.
+
+    Значение, которое scope отдает в with, вызывается с готовым ответом
+    уже после выхода из блока и возвращает ответ клиенту. Под ASGI
+    middleware — корутинная функция, поэтому запросы не проходят через
+    поток синхронного адаптера и не ждут друг друга.
+    """
+    @sync_and_async_middleware
+    @functools.wraps(scope)
+    def middleware_factory(get_response):
+        if asyncio.iscoroutinefunction(get_response):
+            async def middleware(request):
+                with scope(request) as finish:
+                    response = await get_response(request)
+                return finish(response)
+        else:
+            def middleware(request):
+                with scope(request) as finish:
+                    response = get_response(request)
+                return finish(response)
+        return middleware
+    return middleware_factory
@@ -1,5 +1,137 @@
-from rest_framework import mixins, viewsets
+import calendar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import mixins, status, viewsets
+
+from .caching import get_anonymous_cache_key
+from .replicas import primary_reads
 
 
 class ListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     pass
+
+
+class AnonymousCacheMixin:
+    """
+    Кэш готовых ответов анонимным пользователям для list и retrieve.
+
+    get_cache_scopes возвращает области, от которых зависит ответ:
+    их версии входят в ключ, и изменение данных сбрасывает только
+    ответы затронутых областей.
+
+    Версии меняют обработчики сигналов моделей и recipes_changed,
+    поэтому кэш включен только при общем кэше (ANONYMOUS_CACHE), а
+    изменения рецептов в обход save() и delete() должны отправлять
+    recipes_changed. Иначе ответы устаревают на время
+    ANONYMOUS_CACHE_TIMEOUT.
+    """
+
+    def get_cache_scopes(self):
+        raise NotImplementedError
+
+    def cached_response(self, build):
+        request = self.request
+        renderer = request.accepted_renderer
+        if (
+            not settings.ANONYMOUS_CACHE
+            or request.user.is_authenticated
+            or renderer.format != 'json'
+        ):
+            return build()
+        key = get_anonymous_cache_key(request, self.get_cache_scopes())
+        entry = cache.get(key)
+        if entry is None:
+            # Ответ живет в кэше до следующего изменения: реплика могла
+            # еще не получить изменение, сбросившее прежний ответ.
+            with primary_reads():
+                response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {
+                'content': renderer.render(
+                    response.data,
+                    request.accepted_media_type,
+                    self.get_renderer_context(),
+                ),
+                'headers': {
+                    header: response[header]
+                    for header in ('ETag', 'Last-Modified')
+                    if response.has_header(header)
+                },
+            }
+            cache.set(key, entry, settings.ANONYMOUS_CACHE_TIMEOUT)
+        response = HttpResponse(
+            entry['content'], content_type=renderer.media_type
+        )
+        for header, value in entry['headers'].items():
+            response[header] = value
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            lambda: super(AnonymousCacheMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            lambda: super(AnonymousCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
+
+class ConditionalGetMixin:
+    """
+    Заголовки ETag и Last-Modified для list и retrieve.
+
+    get_validators возвращает ETag и дату изменения, вычисленные без
+    сериализации; если клиент прислал совпадающие валидаторы,
+    отвечаем 304 Not Modified, не строя ответ.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def conditional_response(self, build):
+        etag, last_modified = self.get_validators()
+        if last_modified is not None:
+            last_modified = calendar.timegm(last_modified.utctimetuple())
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            return response
+        response = build()
+        if response.status_code == status.HTTP_200_OK:
+            if etag is not None:
+                response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
@@ -0,0 +1,278 @@
+import functools
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.models import Recipe, Subscribe, TimelineEntry
+from .utils import get_subscribed_ids
+
+
+def get_planner_estimate(queryset):
+    """Оценка числа строк выборки планировщиком PostgreSQL."""
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_count_cache_key(queryset):
+    digest = hashlib.sha1(str(queryset.query).encode()).hexdigest()
+    return f'count:{digest}'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator, который точно считает только небольшие выборки.
+
+    Выборку до threshold строк считает COUNT с LIMIT. Если строк больше,
+    на PostgreSQL число берется из оценки планировщика, иначе — из кэша
+    точного COUNT на timeout секунд. Только оценка приблизительна,
+    поэтому страницы за ее пределами не считаются ошибкой; за пределами
+    точного числа, даже закэшированного, — EmptyPage.
+    threshold = None — всегда точный подсчет.
+    """
+
+    def __init__(self, object_list, per_page, threshold=None, timeout=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.threshold = threshold
+        self.timeout = timeout
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        if self.threshold is None or not isinstance(
+            self.object_list, QuerySet
+        ):
+            return super().count
+        queryset = self.object_list.order_by().values('pk')
+        count = queryset[:self.threshold + 1].count()
+        if count <= self.threshold:
+            return count
+        estimate = self.get_estimate(queryset)
+        if estimate is not None and estimate > self.threshold:
+            self.estimated = True
+            return estimate
+        key = get_count_cache_key(queryset)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.timeout)
+        return count
+
+    def get_estimate(self, queryset):
+        """Оценка планировщика или None, если СУБД ее не дает."""
+        if connections[queryset.db].vendor != 'postgresql':
+            return None
+        return get_planner_estimate(queryset)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.estimated or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    Постраничная навигация с приблизительным числом объектов
+    для больших выборок.
+
+    Порог и время жизни кэша задаются атрибутами представления
+    count_threshold и count_cache_timeout, по умолчанию —
+    ESTIMATED_COUNT_THRESHOLD и ESTIMATED_COUNT_TIMEOUT.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = functools.partial(
+            EstimatedCountPaginator,
+            threshold=getattr(
+                view, 'count_threshold', settings.ESTIMATED_COUNT_THRESHOLD
+            ),
+            timeout=getattr(
+                view, 'count_cache_timeout', settings.ESTIMATED_COUNT_TIMEOUT
+            ),
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeKeysetPagination:
+    """
+    Курсорная навигация по рецептам с ключом (pub_date, id).
+
+    Следующая страница выбирается условием по ключу последнего рецепта,
+    без OFFSET и без подсчета общего числа рецептов, поэтому глубина
+    листания не влияет на стоимость запроса. Ключ совпадает только с
+    сортировкой по умолчанию, поэтому выборки с другим порядком
+    (ordering=popular, поиск по релевантности) отклоняются.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    ordering_message = (
+        'Курсорная навигация доступна только для рецептов от новых '
+        'к старым, без ordering и search.'
+    )
+    orderings = ((), ('-pub_date', '-pk'), ('-pub_date', '-id'))
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def encode_cursor(self, recipe):
+        position = f'{recipe.pub_date.isoformat()}|{recipe.pk}'
+        return urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            pub_date, pk = parse_datetime(pub_date), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        if tuple(queryset.query.order_by) not in self.orderings:
+            raise ValidationError(
+                {self.cursor_query_param: [self.ordering_message]}
+            )
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            pub_date, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        page = list(
+            queryset.order_by('-pub_date', '-pk')[:self.page_size + 1]
+        )
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class FeedPagination(RecipeKeysetPagination):
+    """
+    Курсорная навигация по ленте подписок.
+
+    Основная часть ленты — диапазон по индексу (user, pub_date, recipe)
+    таблицы лент. Рецепты авторов с большим числом подписчиков в ленты
+    не копируются: они читаются из рецептов тем же условием по ключу
+    и сливаются с лентой.
+    """
+
+    def get_keys(self, position, limit):
+        """До limit ключей (pub_date, id) рецептов ленты после position."""
+        user = self.request.user
+        sources = [(
+            user.timeline.all(), 'pub_date', 'recipe_id'
+        )]
+        pull_author_ids = TimelineEntry.objects.pull_author_ids(
+            Subscribe.objects.filter(
+                author_id__in=get_subscribed_ids(self.request)
+            )
+        )
+        if pull_author_ids:
+            sources.append((
+                Recipe.objects.filter(author_id__in=pull_author_ids),
+                'pub_date', 'id'
+            ))
+        keys = set()
+        for queryset, date_field, pk_field in sources:
+            if position is not None:
+                pub_date, pk = position
+                queryset = queryset.filter(
+                    Q(**{f'{date_field}__lt': pub_date})
+                    | Q(**{date_field: pub_date, f'{pk_field}__lt': pk})
+                )
+            keys.update(queryset.order_by(
+                f'-{date_field}', f'-{pk_field}'
+            ).values_list(date_field, pk_field)[:limit])
+        return sorted(keys, reverse=True)[:limit]
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param)
+        keys = self.get_keys(
+            self.decode_cursor(cursor) if cursor else None,
+            self.page_size + 1,
+        )
+        self.has_next = len(keys) > self.page_size
+        ids = [pk for _, pk in keys[:self.page_size]]
+        recipes = queryset.in_bulk(ids)
+        self.page = [recipes[pk] for pk in ids if pk in recipes]
+        return self.page
+
+
+class RecipePagination(EstimatedCountPagination):
+    """
+    Постраничная навигация рецептов.
+
+    По умолчанию работает по номерам страниц; параметр
+    pagination=cursor (или переданный cursor) включает курсорный режим.
+    """
+
+    mode_query_param = 'pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or RecipeKeysetPagination.cursor_query_param
+                in request.query_params):
+            self.keyset = RecipeKeysetPagination(self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
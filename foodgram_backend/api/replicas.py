@@ -0,0 +1,103 @@
+'''
+Чтение из реплик БД для безопасных запросов к API.
+'''
+
+import functools
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .middleware import request_middleware
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+API_PREFIX = '/api/'
+REPLICA_APPS = ('recipes',)
+STICKY_COOKIE = 'replica_sticky'
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def primary_reads():
+    """Чтение из основной БД внутри блока, даже в запросе на чтение."""
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def is_sticky(request):
+    """Недавно ли клиент что-то записал: подписанная кука еще не истекла."""
+    return request.get_signed_cookie(
+        STICKY_COOKIE, default=None, salt=STICKY_COOKIE,
+        max_age=settings.REPLICA_STICKY_TIMEOUT,
+    ) is not None
+
+
+class ReplicaRouter:
+    """
+    Модели приложения recipes читаются из случайной реплики, пока
+    действует отметка replica_middleware; запись и все остальное —
+    в основную БД. Миграции на реплики не применяются.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.REPLICA_DATABASES and replica_reads.get()
+            and model._meta.app_label in REPLICA_APPS
+        ):
+            return random.choice(settings.REPLICA_DATABASES)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+def reads_replica(request):
+    if not settings.REPLICA_DATABASES:
+        return False
+    if request.method not in SAFE_METHODS:
+        return False
+    return (
+        request.path_info.startswith(API_PREFIX)
+        and not is_sticky(request)
+    )
+
+
+def set_sticky(request, response):
+    if settings.REPLICA_DATABASES and request.method not in SAFE_METHODS:
+        response.set_signed_cookie(
+            STICKY_COOKIE, '1', salt=STICKY_COOKIE,
+            max_age=settings.REPLICA_STICKY_TIMEOUT,
+            httponly=True, samesite='Lax',
+        )
+    return response
+
+
+@request_middleware
+@contextmanager
+def replica_middleware(request):
+    """
+    Отправляет безопасные запросы к API в реплики.
+
+    После запроса на изменение клиент получает подписанную куку и
+    REPLICA_STICKY_TIMEOUT секунд читает из основной БД, поэтому видит
+    свои изменения, даже если реплики еще отстают. Отметка хранится у
+    клиента, а не в кэше процесса, и действует на любом воркере.
+    """
+    token = replica_reads.set(reads_replica(request))
+    try:
+        yield functools.partial(set_sticky, request)
+    finally:
+        replica_reads.reset(token)
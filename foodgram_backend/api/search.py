@@ -0,0 +1,127 @@
+'''
+Поисковый индекс ингредиентов в памяти процесса.
+'''
+
+import threading
+import time
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+
+def normalize(value):
+    return ' '.join(value.casefold().split())
+
+
+def trigrams(value):
+    """Триграммы строки в духе pg_trgm: каждое слово дополняется пробелами."""
+    result = set()
+    for word in value.split():
+        padded = f'  {word} '
+        result.update(
+            padded[i:i + 3] for i in range(len(padded) - 2)
+        )
+    return result
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов.
+
+    Отсортированный массив нормализованных названий отвечает на поиск
+    по префиксу двоичным поиском, а таблица триграмм используется,
+    когда по префиксу ничего не нашлось (опечатки в запросе).
+    Индекс строится лениво при первом обращении и перестраивается после
+    изменения ингредиентов или по истечении INGREDIENT_INDEX_TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def invalidate(self):
+        self._state = None
+
+    def _build(self):
+        entries = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        ]
+        names = [normalize(entry['name']) for entry in entries]
+        order = sorted(range(len(entries)), key=lambda i: (names[i], i))
+        grams = defaultdict(list)
+        sizes = []
+        for position, name in enumerate(names):
+            name_grams = trigrams(name)
+            sizes.append(len(name_grams))
+            for gram in name_grams:
+                grams[gram].append(position)
+        return {
+            'built': time.monotonic(),
+            'entries': entries,
+            'names': names,
+            'keys': [names[i] for i in order],
+            'order': order,
+            'trigrams': dict(grams),
+            'sizes': sizes,
+        }
+
+    def _get_state(self):
+        state = self._state
+        ttl = settings.INGREDIENT_INDEX_TTL
+        if state is None or time.monotonic() - state['built'] > ttl:
+            with self._lock:
+                state = self._state
+                if state is None or time.monotonic() - state['built'] > ttl:
+                    state = self._state = self._build()
+        return state
+
+    def search(self, query, limit=None):
+        """Ингредиенты, подходящие под запрос, от лучшего к худшему."""
+        state = self._get_state()
+        query = normalize(query)
+        if not query:
+            return state['entries']
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        positions = self._prefix(state, query, limit)
+        if not positions:
+            positions = self._fuzzy(state, query, limit)
+        return [state['entries'][position] for position in positions]
+
+    def _prefix(self, state, query, limit):
+        keys = state['keys']
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\uffff', start)
+        names = state['names']
+        return heapq.nsmallest(
+            limit,
+            state['order'][start:end],
+            key=lambda i: (names[i] != query, len(names[i]), names[i])
+        )
+
+    def _fuzzy(self, state, query, limit):
+        query_grams = trigrams(query)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for position in state['trigrams'].get(gram, ()):
+                shared[position] += 1
+        names = state['names']
+        sizes = state['sizes']
+        threshold = settings.INGREDIENT_SEARCH_SIMILARITY
+        scored = []
+        for position, count in shared.items():
+            similarity = count / (len(query_grams) + sizes[position] - count)
+            if similarity >= threshold:
+                scored.append((-similarity, names[position], position))
+        scored.sort()
+        return [position for _, _, position in scored[:limit]]
+
+
+ingredient_index = IngredientIndex()
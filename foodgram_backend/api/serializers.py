@@ -1,11 +1,34 @@
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueTogetherValidator
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
 
-from recipes.models import Subscribe, Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.models import (Subscribe, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListItem, Tag, TimelineEntry)
+from recipes.images import schedule_recipe_image
+from recipes.signals import recipes_changed
 from users.models import User
+from .utils import get_recipes_limit, get_subscribed_ids
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Адреса уменьшенных копий изображения рецепта."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for variant, formats in value.items():
+            urls[variant] = {}
+            for image_format, name in formats.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[variant][image_format] = url
+        return urls
 
 
 class CustomUserSerializer(UserSerializer):
@@ -25,10 +48,10 @@ class CustomUserSerializer(UserSerializer):
                   )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
+        request = self.context['request']
+        if request.user.is_anonymous:
             return False
-        return obj.subscriber.filter(user=user).exists()
+        return obj.id in get_subscribed_ids(request)
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -90,26 +113,23 @@ class RecipeListSerializer(serializers.ModelSerializer):
         source='ingredient'
     )
     image = Base64ImageField(max_length=None, use_url=True)
+    image_variants = ImageVariantsField()
     tags = TagSerializer(many=True, read_only=True)
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Recipe
-        fields = ('__all__')
+        exclude = ('search_vector',)
         read_only_fields = ('id', 'author',)
 
-    def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.favorites.filter(user=user).exists()
-
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.shopping.filter(user=user).exists()
+    def __init__(self, *args, **kwargs):
+        """Оставляет только поля, запрошенные параметром fields."""
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
 
 
 class CreateIngredientSerializer(serializers.ModelSerializer):
@@ -128,12 +148,103 @@ class CreateIngredientSerializer(serializers.ModelSerializer):
         fields = ('recipe', 'id', 'amount')
 
 
+def to_int(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TagPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Первичный ключ тега; при массовом импорте теги берутся из контекста."""
+
+    def to_internal_value(self, data):
+        tags = self.context.get('tags')
+        if tags is None:
+            return super().to_internal_value(data)
+        pk = to_int(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in tags:
+            self.fail('does_not_exist', pk_value=data)
+        return tags[pk]
+
+
+class RecipeBulkCreateSerializer(serializers.ListSerializer):
+    """
+    Массовое создание рецептов.
+
+    Теги и ингредиенты всех рецептов проверяются двумя запросами, а
+    рецепты, их теги и ингредиенты записываются пакетными вставками в
+    одной транзакции.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            if len(data) > settings.RECIPE_BULK_CREATE_LIMIT:
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        f'Не более {settings.RECIPE_BULK_CREATE_LIMIT} '
+                        f'рецептов за один запрос.'
+                    ]
+                })
+            self.context['tags'] = Tag.objects.in_bulk()
+            self.context['ingredients'] = Ingredient.objects.in_bulk({
+                to_int(ingredient.get('id'))
+                for recipe in data if isinstance(recipe, dict)
+                if isinstance(recipe.get('ingredients'), list)
+                for ingredient in recipe['ingredients']
+                if isinstance(ingredient, dict)
+            } - {None})
+        return super().to_internal_value(data)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        recipes = [
+            Recipe(**{
+                field: value for field, value in data.items()
+                if field not in ('tags', 'ingredients')
+            })
+            for data in validated_data
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            TimelineEntry.objects.fan_out(recipes)
+            recipes_changed.send(sender=Recipe, recipes=recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe, data in zip(recipes, validated_data)
+            for tag in dict.fromkeys(data['tags'])
+        ])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount']
+            )
+            for recipe, data in zip(recipes, validated_data)
+            for ingredient in data['ingredients']
+        ])
+        for recipe in recipes:
+            schedule_recipe_image(recipe)
+        return recipes
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор создания рецепта."""
 
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     ingredients = CreateIngredientSerializer(many=True)
+    tags = TagPrimaryKeyRelatedField(
+        many=True, allow_empty=False, queryset=Tag.objects.all()
+    )
     cooking_time = serializers.IntegerField(
         write_only=True,
         min_value=settings.MIN_COOKING_TIME_AND_AMOUNT_INGREDIENT,
@@ -142,25 +253,36 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        exclude = ('search_vector',)
+        list_serializer_class = RecipeBulkCreateSerializer
 
     def validate(self, data):
         ingredients = data.get('ingredients')
-        ingredients_list = []
-        for ingredient in ingredients:
-            ingredients_list.append(ingredient.get('id'))
-        for ingredient in ingredients:
-            if ingredients_list.count(ingredient['id']) > 1:
-                dublicate = Ingredient.objects.get(
-                    pk=ingredient.get('id')
-                )
+        if ingredients is None:
+            return data
+        ids = [ingredient['id'] for ingredient in ingredients]
+        known = self.context.get('ingredients')
+        if known is None:
+            known = Ingredient.objects.in_bulk(set(ids))
+        missing = sorted(set(ids) - known.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиентов с id {", ".join(map(str, missing))} '
+                f'не существует.'
+            )
+        seen = set()
+        for pk in ids:
+            if pk in seen:
                 raise serializers.ValidationError(
-                    f'Ингредиент, {dublicate}, '
+                    f'Ингредиент, {known[pk]}, '
                     f'выбран более одного раза.'
                 )
+            seen.add(pk)
         return data
 
     def create_ingredients(self, recipe, ingredients):
+        if not ingredients:
+            return
         create_ingredients = [
             RecipeIngredient(
                 recipe=recipe,
@@ -179,8 +301,61 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        schedule_recipe_image(recipe)
         return recipe
 
+    def update_tags(self, recipe, tags):
+        """Удаляет и добавляет только изменившиеся теги рецепта."""
+        through = Recipe.tags.through
+        current = set(
+            through.objects.filter(recipe=recipe).values_list(
+                'tag_id', flat=True
+            )
+        )
+        new = {tag.pk for tag in tags}
+        if current - new:
+            through.objects.filter(
+                recipe=recipe, tag_id__in=current - new
+            ).delete()
+        if new - current:
+            through.objects.bulk_create([
+                through(recipe=recipe, tag_id=tag_id)
+                for tag_id in new - current
+            ])
+
+    def update_ingredients(self, recipe, ingredients):
+        """
+        Приводит ингредиенты рецепта к переданным.
+
+        Удаляются, изменяются и создаются только отличающиеся строки.
+        Возвращает количества ингредиентов до и после изменения.
+        """
+        current = {row.ingredient_id: row for row in recipe.ingredient.all()}
+        old_amounts = {pk: row.amount for pk, row in current.items()}
+        new_amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = [
+            row.pk for pk, row in current.items() if pk not in new_amounts
+        ]
+        changed = []
+        for pk, amount in new_amounts.items():
+            row = current.get(pk)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(recipe, [
+            ingredient for ingredient in ingredients
+            if ingredient['id'] not in current
+        ])
+        return old_amounts, new_amounts
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
@@ -188,14 +363,20 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'cooking_time', instance.cooking_time
         )
         if 'tags' in validated_data:
-            instance.tags.set(validated_data.get('tags'))
+            self.update_tags(instance, validated_data['tags'])
         if 'ingredients' in validated_data:
-            instance.ingredients.clear()
-            self.create_ingredients(
-                instance, validated_data.get('ingredients')
+            old_amounts, new_amounts = self.update_ingredients(
+                instance, validated_data['ingredients']
             )
-        instance.image = validated_data.get('image', instance.image)
+            ShoppingListItem.objects.update_recipe(
+                instance, old_amounts, new_amounts
+            )
+        if 'image' in validated_data:
+            instance.image = validated_data['image']
+            instance.image_variants = {}
         instance.save()
+        if 'image' in validated_data:
+            schedule_recipe_image(instance)
         return instance
 
     def to_representation(self, obj):
@@ -203,7 +384,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.fields.pop('ingredients')
         representation = super().to_representation(obj)
         representation['ingredients'] = RecipeIngredientsSerializer(
-            obj.ingredient.all(), many=True
+            obj.ingredient.select_related('ingredient'), many=True
         ).data
         return representation
 
@@ -211,9 +392,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 class SubscribeRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор отображения информации рецепта в подписке."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -226,7 +409,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
     email = serializers.ReadOnlyField(source='author.email')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Subscribe
@@ -236,17 +419,15 @@ class SubscribeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return obj.author.subscriber.filter(user=obj.user).exists()
+        """Каждая запись — подписка текущего пользователя на автора."""
+        return True
 
     def get_recipes(self, obj):
         return SubscribeRecipeSerializer(
-            obj.author.recipes.all(),
+            obj.author.limited_recipes,
             many=True
         ).data
 
-    def get_recipes_count(self, obj):
-        return obj.author.recipes.count()
-
 
 class SubscribeUserSerializer(serializers.ModelSerializer):
     """Сериализатор создания/отмены подписки на пользователя."""
@@ -271,6 +452,9 @@ class SubscribeUserSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         request = self.context.get('request')
+        instance = Subscribe.objects.with_recipes(
+            get_recipes_limit(request)
+        ).get(pk=instance.pk)
         return SubscribeSerializer(
             instance,
             context={'request': request}
@@ -280,6 +464,29 @@ class SubscribeUserSerializer(serializers.ModelSerializer):
 class ShoppingCartRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор отображения рецептов в подписке."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления в избранное/покупки."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_LIMIT,
+    )
+
+    def validate_recipes(self, value):
+        """Рецепты загружаются одним запросом, порядок id сохраняется."""
+        ids = list(dict.fromkeys(value))
+        known = Recipe.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in known]
+        if missing:
+            raise serializers.ValidationError(
+                f'Рецептов с id {", ".join(map(str, missing))} не существует.'
+            )
+        return [known[pk] for pk in ids]
@@ -0,0 +1,126 @@
+'''
+Формирование файла списка покупок в форматах txt, csv и pdf.
+'''
+
+import csv
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+FONT_NAME = 'Verdana'
+FONT_PATH = settings.BASE_DIR / 'fonts' / 'verdana.ttf'
+CHUNK_SIZE = 8192
+
+
+def get_ingredients(user):
+    """Суммарное количество каждого ингредиента из списка покупок."""
+    return user.shopping_list.values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        ingredient_amount=F('amount'),
+    ).order_by('ingredient__name')
+
+
+def render_txt(ingredients):
+    yield 'Список покупок:'
+    for ingredient in ingredients:
+        name = ingredient['ingredient__name']
+        unit = ingredient['ingredient__measurement_unit']
+        amount = ingredient['ingredient_amount']
+        yield f'\n{name} - {amount}, {unit}'
+
+
+def render_csv(ingredients):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    yield buffer.getvalue()
+    for ingredient in ingredients:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient_amount'],
+            ingredient['ingredient__measurement_unit'],
+        ))
+        yield buffer.getvalue()
+
+
+def render_pdf(ingredients):
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    top, bottom, left, step = height - 60, 50, 50, 20
+    page.setFont(FONT_NAME, 18)
+    page.drawString(left, top, 'Список покупок:')
+    page.setFont(FONT_NAME, 12)
+    y = top - 2 * step
+    for ingredient in ingredients:
+        if y < bottom:
+            page.showPage()
+            page.setFont(FONT_NAME, 12)
+            y = top
+        page.drawString(
+            left, y,
+            f'• {ingredient["ingredient__name"]} - '
+            f'{ingredient["ingredient_amount"]}, '
+            f'{ingredient["ingredient__measurement_unit"]}'
+        )
+        y -= step
+    page.save()
+    yield buffer.getvalue()
+
+
+FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'pdf': ('application/pdf', render_pdf),
+}
+
+
+def get_cache_key(user, file_format):
+    """
+    Ключ кэша, зависящий от содержимого списка покупок.
+
+    Отпечаток строится по позициям агрегированного списка покупок,
+    поэтому любое изменение списка дает новый ключ.
+    """
+    rows = user.shopping_list.order_by('ingredient_id').values_list(
+        'ingredient_id', 'amount'
+    )
+    digest = hashlib.sha1(repr(list(rows)).encode()).hexdigest()
+    return f'shopping_list:{user.pk}:{file_format}:{digest}'
+
+
+def stream_shopping_list(user, file_format):
+    """
+    Итератор по частям файла списка покупок.
+
+    Готовый файл берется из кэша; иначе части отдаются по мере
+    формирования и после последней сохраняются в кэш целиком.
+    """
+    cache_key = get_cache_key(user, file_format)
+    content = cache.get(cache_key)
+    if content is not None:
+        for start in range(0, len(content), CHUNK_SIZE):
+            yield content[start:start + CHUNK_SIZE]
+        return
+    _, render = FORMATS[file_format]
+    parts = []
+    for part in render(get_ingredients(user)):
+        if isinstance(part, str):
+            part = part.encode()
+        parts.append(part)
+        yield part
+    cache.set(
+        cache_key, b''.join(parts), settings.SHOPPING_LIST_CACHE_TIMEOUT
+    )
@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.signals import (AUTHOR_FIELDS, recipes_changed,
+                             reference_data_changed)
+from users.models import User
+from .caching import (INGREDIENTS_CACHE_KEY, TAGS_CACHE_KEY,
+                      invalidate_recipes, invalidate_reference_data)
+from .search import ingredient_index
+
+
+def invalidate_recipes_on_commit(rows):
+    """
+    Сбрасывает кэш ответов по парам (id рецепта, id автора).
+
+    Сброс откладывается до фиксации транзакции, чтобы параллельный
+    запрос не успел снова закэшировать старые данные.
+    """
+    rows = list(rows)
+    if rows:
+        recipe_ids, author_ids = zip(*rows)
+        transaction.on_commit(
+            lambda: invalidate_recipes(recipe_ids, set(author_ids))
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(reference_data_changed, sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    ingredient_index.invalidate()
+    invalidate_reference_data(INGREDIENTS_CACHE_KEY)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(reference_data_changed, sender=Tag)
+def invalidate_tags(**kwargs):
+    invalidate_reference_data(TAGS_CACHE_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(instance, **kwargs):
+    invalidate_recipes_on_commit([(instance.pk, instance.author_id)])
+
+
+@receiver(recipes_changed)
+def invalidate_changed_recipes(recipes, **kwargs):
+    invalidate_recipes_on_commit(
+        (recipe.pk, recipe.author_id) for recipe in recipes
+    )
+
+
+# Удаление ингредиентов рецепта не отслеживается: обработчик post_delete
+# отключил бы быстрое удаление строк одним запросом, а удаляются они
+# только при сохранении или удалении самого рецепта.
+@receiver(post_save, sender=RecipeIngredient)
+def invalidate_recipe_ingredient(instance, **kwargs):
+    invalidate_recipes_on_commit(Recipe.objects.filter(
+        pk=instance.recipe_id
+    ).values_list('pk', 'author_id'))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_related_recipes(instance, **kwargs):
+    invalidate_recipes_on_commit(
+        instance.recipes.values_list('pk', 'author_id')
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    invalidate_recipes_on_commit(
+        instance.recipes.values_list('pk', 'author_id')
+    )
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from .async_views import async_patterns
 from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewset,
                     SubscribeView, SubscriptionsList, TagViewSet)
 
@@ -13,10 +15,14 @@ router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewset, basename='recipes')
 
+router_v1_urls = router_v1.urls
+if settings.ASYNC_VIEWS:
+    router_v1_urls = async_patterns(router_v1_urls)
+
 urlpatterns = [
     path(r'users/<int:user_id>/subscribe/', SubscribeView.as_view()),
     path(r'users/subscriptions/', SubscriptionsList.as_view({'get': 'list'})),
-    path('', include(router_v1.urls)),
+    path('', include(router_v1_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,29 +1,98 @@
+from django.db import IntegrityError
 from django.shortcuts import get_object_or_404
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from recipes.models import Recipe
 
 
 def post(request, pk, model, serializer):
+    """Добавление рецепта одним INSERT; повтор отсекает ограничение БД."""
     recipe = get_object_or_404(Recipe, pk=pk)
-    if model.objects.filter(user=request.user, recipe=recipe).exists():
+    try:
+        model.objects.add_recipe(request.user, recipe)
+    except IntegrityError:
         return Response(
             {'Notification': 'Рецепт уже есть в избранном/списке покупок'},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    model.objects.get_or_create(user=request.user, recipe=recipe)
-    data = serializer(recipe).data
+    data = serializer(recipe, context={'request': request}).data
     return Response(data, status=status.HTTP_201_CREATED)
 
 
 def delete(request, pk, models):
-    obj = get_object_or_404(Recipe, pk=pk)
-    needed_recipe = models.objects.filter(recipe=obj, user=request.user)
-    if not needed_recipe.exists():
+    if not models.objects.remove_recipes(request.user, [pk]):
+        obj = get_object_or_404(Recipe, pk=pk)
         return Response(
             {'Notification':
                 f'Вы не добавляли рецепт {obj}.'}
         )
-    needed_recipe.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def post_many(request, recipes, model, serializer):
+    """
+    Добавление нескольких рецептов одним запросом.
+
+    Уже добавленные рецепты пропускаются, в ответе — только новые.
+    """
+    added = set(model.objects.add_recipes(
+        request.user, [recipe.pk for recipe in recipes]
+    ))
+    data = serializer(
+        [recipe for recipe in recipes if recipe.pk in added],
+        many=True,
+        context={'request': request},
+    ).data
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
+def delete_many(request, recipes, model):
+    """Удаление нескольких рецептов одним запросом."""
+    model.objects.remove_recipes(
+        request.user, [recipe.pk for recipe in recipes]
+    )
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    if request is None:
+        return None
+    recipes_limit = request.query_params.get('recipes_limit', '')
+    if not recipes_limit.isdigit():
+        return None
+    return int(recipes_limit)
+
+
+def get_requested_fields(request, known):
+    """
+    Множество полей из параметра fields или None, если он не задан.
+
+    Поле id входит в ответ всегда; неизвестные поля — ошибка 400.
+    """
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = fields - set(known)
+    if unknown:
+        raise ValidationError({'fields': [
+            f'Неизвестное поле: {name}.' for name in sorted(unknown)
+        ]})
+    return fields | {'id'}
+
+
+def get_subscribed_ids(request):
+    """
+    Множество id авторов, на которых подписан пользователь запроса.
+
+    Загружается один раз за запрос и переиспользуется всеми
+    сериализаторами пользователей.
+    """
+    if not hasattr(request, '_subscribed_ids'):
+        request._subscribed_ids = set(
+            request.user.subscriber.values_list('author_id', flat=True)
+        )
+    return request._subscribed_ids
@@ -1,25 +1,36 @@
+import hashlib
+
 from djoser import views
 from django_filters.rest_framework import DjangoFilterBackend
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Sum
 
 from recipes.models import (Favorite, Subscribe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+                            ShoppingCart, Tag)
 from users.models import User
 from .serializers import (CustomUserSerializer, IngredientSerializer,
                           RecipeCreateSerializer, RecipeListSerializer,
                           SubscribeRecipeSerializer, SubscribeSerializer,
                           SubscribeUserSerializer, TagSerializer,
-                          ShoppingCartRecipeSerializer)
-from .mixins import ListViewSet
+                          ShoppingCartRecipeSerializer, RecipeIdsSerializer)
+from .mixins import AnonymousCacheMixin, ConditionalGetMixin, ListViewSet
+from .pagination import FeedPagination, RecipePagination
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from .filters import IngredientSearchFilter, RecipeFilter
-from .utils import delete, post
+from .filters import RecipeFilter
+from .search import ingredient_index
+from .shopping_list import FORMATS, stream_shopping_list
+from .caching import (INGREDIENTS_CACHE_KEY, LIST_SCOPE, TAGS_CACHE_KEY,
+                      author_scope, get_reference_data, recipe_scope,
+                      reference_response)
+from .utils import (delete, delete_many, get_recipes_limit,
+                    get_requested_fields, get_subscribed_ids, post,
+                    post_many)
 
 
 class CustomUserViewSet(views.UserViewSet):
@@ -27,6 +38,14 @@ class CustomUserViewSet(views.UserViewSet):
     serializer_class = CustomUserSerializer
     queryset = User.objects.all()
 
+    @action(
+        ['get', 'put', 'patch', 'delete'],
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def me(self, request, *args, **kwargs):
+        return super().me(request, *args, **kwargs)
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
 
@@ -34,35 +53,131 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        entry = get_reference_data(
+            TAGS_CACHE_KEY,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
+        return reference_response(request, entry)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
 
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     pagination_class = None
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+
+    def list(self, request, *args, **kwargs):
+        """Поиск по названию отвечает из индекса, без запросов к БД."""
+        name = request.query_params.get('name', '')
+        if name or request.accepted_renderer.format != 'json':
+            return Response(ingredient_index.search(name))
+        entry = get_reference_data(
+            INGREDIENTS_CACHE_KEY,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
+        return reference_response(request, entry)
 
 
-class RecipeViewset(viewsets.ModelViewSet):
+class RecipeViewset(AnonymousCacheMixin, ConditionalGetMixin,
+                    viewsets.ModelViewSet):
 
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
     permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
 
     def get_queryset(self):
-        user = self.request.user
         queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        queryset = queryset.for_list(
+            self.request.user, self.get_requested_fields()
+        )
         is_favorited = self.request.query_params.get('is_favorited')
         if is_favorited:
-            return queryset.filter(favorites__user=user)
+            return queryset.filter(is_favorited=True)
         is_in_shopping_cart = self.request.query_params.get(
             'is_in_shopping_cart')
         if is_in_shopping_cart:
-            return queryset.filter(shopping__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def get_requested_fields(self):
+        """Поля из параметра fields; разбираются один раз за запрос."""
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = get_requested_fields(
+                self.request, RecipeListSerializer().fields
+            )
+        return self._requested_fields
+
+    def filter_queryset(self, queryset):
+        """
+        Фильтры списка применяются один раз за запрос: выборку
+        использует и ETag, и сам ответ.
+        """
+        if self.action != 'list':
+            return super().filter_queryset(queryset)
+        if not hasattr(self, '_filtered_queryset'):
+            self._filtered_queryset = super().filter_queryset(queryset)
+        return self._filtered_queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'GET':
+            context['fields'] = self.get_requested_fields()
+        return context
+
+    def get_cache_scopes(self):
+        if self.action == 'retrieve':
+            return [recipe_scope(self.kwargs['pk'])]
+        author = self.request.query_params.get('author')
+        if author:
+            return [author_scope(author)]
+        return [LIST_SCOPE]
+
+    def get_validators(self):
+        """
+        ETag и Last-Modified без построения ответа.
+
+        Для рецепта берется дата его изменения и флаги пользователя.
+        Для списка одним агрегатом по отфильтрованной выборке берутся
+        последняя дата изменения и число рецептов: любое изменение
+        рецепта, в том числе его счетчиков и флагов пользователя,
+        сдвигает дату, а удаление меняет число. Last-Modified у списка
+        не отдается, потому что удаление рецепта дату не меняет. Ответ
+        пользователю зависит еще и от его подписок, поэтому они входят
+        в ETag, а Last-Modified не отдается.
+        """
+        user = self.request.user
+        if self.action == 'retrieve':
+            try:
+                row = Recipe.objects.with_user_flags(user).filter(
+                    pk=self.kwargs['pk']
+                ).values_list(
+                    'updated_at', 'is_favorited', 'is_in_shopping_cart'
+                ).first()
+            except (TypeError, ValueError):
+                row = None
+            if row is None:
+                return None, None
+            updated_at, *state = row
+        else:
+            updated_at, state = None, list(self.filter_queryset(
+                self.get_queryset()
+            ).order_by().values('pk', 'updated_at').aggregate(
+                Max('updated_at'), Count('pk')
+            ).values())
+        if user.is_authenticated:
+            state += [user.pk, sorted(get_subscribed_ids(self.request))]
+        digest = hashlib.sha1(
+            repr([updated_at and updated_at.isoformat(), state]).encode()
+        ).hexdigest()
+        return f'W/"{digest}"', None if user.is_authenticated else updated_at
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeListSerializer
@@ -71,6 +186,34 @@ class RecipeViewset(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False,
+        methods=['POST'],
+        permission_classes=[IsAuthenticated]
+    )
+    def bulk(self, request):
+        """Создание нескольких рецептов одним запросом."""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save(author=request.user)
+        queryset = Recipe.objects.for_list(request.user).filter(
+            pk__in=[recipe.pk for recipe in recipes]
+        )
+        return Response(
+            RecipeListSerializer(
+                queryset, many=True, context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь."""
+        paginator = FeedPagination(self.paginator.get_page_size(request))
+        page = paginator.paginate_queryset(self.get_queryset(), request)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
@@ -106,21 +249,52 @@ class RecipeViewset(viewsets.ModelViewSet):
                           )
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    def batch(self, request, model, serializer):
+        ids = RecipeIdsSerializer(data=request.data)
+        ids.is_valid(raise_exception=True)
+        recipes = ids.validated_data['recipes']
+        if request.method == 'POST':
+            return post_many(request, recipes, model, serializer)
+        return delete_many(request, recipes, model)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        """Добавление/удаление нескольких рецептов в избранном."""
+        return self.batch(request, Favorite, SubscribeRecipeSerializer)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        """Добавление/удаление нескольких рецептов в списке покупок."""
+        return self.batch(
+            request, ShoppingCart, ShoppingCartRecipeSerializer
+        )
+
     @action(detail=False, permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount'))
-        shopping_list = ['Список покупок:']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['ingredient_amount']
-            shopping_list.append(f'\n{name} - {amount}, {unit}')
-        filename = f'{request.user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in FORMATS:
+            return Response(
+                {'file_format': f'Доступные форматы: {", ".join(FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        content_type, _ = FORMATS[file_format]
+        filename = f'{request.user.username}_shopping_list.{file_format}'
+        response = StreamingHttpResponse(
+            stream_shopping_list(request.user, file_format),
+            content_type=content_type,
+        )
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
@@ -131,8 +305,9 @@ class SubscriptionsList(ListViewSet):
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        user = self.request.user
-        return user.subscriber.all()
+        return self.request.user.subscriber.with_recipes(
+            get_recipes_limit(self.request)
+        ).order_by('id')
 
 
 class SubscribeView(APIView):
@@ -141,7 +316,8 @@ class SubscribeView(APIView):
 
     def post(self, request, user_id):
         serializer = SubscribeUserSerializer(
-            data={'user': request.user.id, 'author': user_id}
+            data={'user': request.user.id, 'author': user_id},
+            context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -11,6 +12,9 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
 
+# Async-версии маршрутов чтения; включается в foodgram_backend/asgi.py.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost, 127.0.0.1').split()
 
 INSTALLED_APPS = [
@@ -23,7 +27,6 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
-    'debug_toolbar',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -31,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,9 +42,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'api.replicas.replica_middleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'foodgram_backend.urls'
 
 TEMPLATES = [
@@ -74,6 +82,54 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: DB_REPLICAS — хосты через запятую, для SQLite —
+# имена файлов. Остальные параметры подключения берутся из default.
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+    filter(None, map(str.strip, os.getenv('DB_REPLICAS', '').split(','))),
+    start=1,
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3')
+        else 'HOST': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает из основной БД.
+REPLICA_STICKY_TIMEOUT = 10
+
+# По умолчанию кэш хранится в памяти процесса. Чтобы сброс кэша в одном
+# процессе (в том числе в management-командах) видели все воркеры,
+# нужен общий кэш, например CACHE_BACKEND=
+# django.core.cache.backends.db.DatabaseCache и CACHE_LOCATION=
+# foodgram_cache (таблицу создает команда createcachetable).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Кэш ответов анонимам (api/mixins.py) сбрасывается в том процессе, который
+# изменил рецепты, поэтому включается только с общим для процессов кэшем.
+ANONYMOUS_CACHE = not CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+# Файлы метрик процессов, которые суммирует /metrics.
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'foodgram_metrics')
+)
+METRICS_FLUSH_INTERVAL = 1
+
+# Выборки больше порога считаются приблизительно, см. api/pagination.py.
+ESTIMATED_COUNT_THRESHOLD = 1000
+ESTIMATED_COUNT_TIMEOUT = 60
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,7 +170,16 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.EstimatedCountPagination',
     'PAGE_SIZE': 6,
 }
 
@@ -136,3 +201,23 @@ DJOSER = {
 
 MIN_COOKING_TIME_AND_AMOUNT_INGREDIENT = 1
 MAX_COOKING_TIME_AND_AMOUNT_INGREDIENT = 32000
+
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_SEARCH_SIMILARITY = 0.3
+INGREDIENT_INDEX_TTL = 300
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+REFERENCE_CACHE_TIMEOUT = 600
+
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+RECIPE_IMAGE_VARIANTS = {
+    'card': (360, 360),
+    'detail': (800, 800),
+    'retina': (1600, 1600),
+}
+RECIPE_BULK_CREATE_LIMIT = 500
+RECIPE_BATCH_LIMIT = 100
+
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 60
+FEED_TIMELINE_ROWS_LIMIT = 20000
+ANONYMOUS_CACHE_TIMEOUT = 300
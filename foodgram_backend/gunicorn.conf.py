@@ -0,0 +1,19 @@
+'''
+Настройки gunicorn: файл читается из рабочего каталога автоматически.
+'''
+
+import os
+
+
+def child_exit(server, worker):
+    """Метрики завершившегося воркера сливаются в общий файл."""
+    import django
+
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings'
+    )
+    django.setup(set_prefix=False)
+
+    from api.metrics import prune_exited
+
+    prune_exited()
@@ -1,7 +1,9 @@
+from collections import defaultdict
+
 from django.contrib import admin
 
 from .models import (Favorite, Subscribe, Ingredient, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
 
 
 @admin.register(Ingredient)
@@ -13,7 +15,8 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'pub_date',)
+    list_display = ('id', 'name', 'author', 'pub_date', 'favorites_count',
+                    'shopping_count',)
     list_filter = ('author__username', 'name', 'tags',)
     search_fields = ('author__username', 'name', 'tags__name',)
 
@@ -35,8 +38,35 @@ class SubscribeAdmin(admin.ModelAdmin):
                 f'подписан на {str(obj.author).capitalize()}.')
 
 
+class UserRecipeAdmin(admin.ModelAdmin):
+    """
+    Рецепты пользователей добавляются и удаляются через
+    UserRecipeQuerySet: вместе со строками меняются счетчики рецептов
+    и список покупок. Поэтому у существующей записи поля не меняются.
+    """
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return ('user', 'recipe')
+        return super().get_readonly_fields(request, obj)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.pk = type(obj).objects.add_recipe(obj.user, obj.recipe).pk
+
+    def delete_model(self, request, obj):
+        type(obj).objects.remove_recipes(obj.user, [obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = defaultdict(list)
+        for obj in queryset.select_related('user'):
+            recipe_ids[obj.user].append(obj.recipe_id)
+        for user, ids in recipe_ids.items():
+            queryset.model.objects.remove_recipes(user, ids)
+
+
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(UserRecipeAdmin):
     list_display = ('id', 'get_favorites',)
     search_fields = ('recipe__name', 'user__username',)
 
@@ -45,7 +75,7 @@ class FavoriteAdmin(admin.ModelAdmin):
 
 
 @admin.register(ShoppingCart)
-class ShoppingAdmin(admin.ModelAdmin):
+class ShoppingAdmin(UserRecipeAdmin):
     list_display = ('id', 'get_shopping',)
     list_filter = ('recipe',)
     search_fields = ('recipe__name',)
@@ -53,3 +83,9 @@ class ShoppingAdmin(admin.ModelAdmin):
     def get_shopping(self, obj):
         return (f'"{obj.recipe}" добавлен в покупки '
                 f'пользователем {str(obj.user).capitalize()}.')
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'amount',)
+    search_fields = ('user__username', 'ingredient__name',)
@@ -0,0 +1,131 @@
+'''
+Уменьшенные копии изображений рецептов в форматах WebP и JPEG.
+'''
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def get_formats():
+    return [name for name in FORMATS
+            if name != 'webp' or features.check('webp')]
+
+
+def render_variants(media_root, name, variants, formats):
+    """
+    Сохраняет уменьшенные копии изображения и возвращает их имена.
+
+    Функция не обращается к Django и выполняется в отдельном процессе:
+    результат вида {вариант: {формат: имя файла}} передается обратно.
+    """
+    stem, _ = os.path.splitext(os.path.basename(name))
+    folder = os.path.join(os.path.dirname(name), 'variants')
+    os.makedirs(os.path.join(media_root, folder), exist_ok=True)
+    result = {}
+    with Image.open(os.path.join(media_root, name)) as source:
+        source.load()
+        image = source.convert('RGB')
+    for variant, size in variants.items():
+        copy = image.copy()
+        copy.thumbnail(size, Image.LANCZOS)
+        result[variant] = {}
+        for image_format in formats:
+            pillow_format, params = FORMATS[image_format]
+            variant_name = os.path.join(
+                folder, f'{stem}_{variant}.{image_format}'
+            )
+            copy.save(
+                os.path.join(media_root, variant_name), pillow_format,
+                **params
+            )
+            result[variant][image_format] = variant_name
+    return result
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def save_variants(recipe, variants):
+    """Сохраняет варианты, если изображение рецепта не успело смениться."""
+    from .signals import recipes_changed
+
+    if type(recipe).objects.filter(
+        pk=recipe.pk, image=recipe.image.name
+    ).update(image_variants=variants, updated_at=timezone.now()):
+        recipes_changed.send(sender=type(recipe), recipes=[recipe])
+
+
+def process_recipe_image(recipe):
+    """Синхронно строит варианты изображения рецепта."""
+    variants = render_variants(
+        settings.MEDIA_ROOT,
+        recipe.image.name,
+        settings.RECIPE_IMAGE_VARIANTS,
+        get_formats(),
+    )
+    save_variants(recipe, variants)
+    return variants
+
+
+def schedule_recipe_image(recipe):
+    """
+    Ставит построение вариантов изображения в очередь пула процессов.
+
+    Задача отправляется после фиксации транзакции, а рабочий процесс
+    gunicorn не ждет ее завершения. При IMAGE_PROCESSING_WORKERS = 0
+    варианты строятся сразу, в текущем процессе.
+    """
+    def process():
+        try:
+            process_recipe_image(recipe)
+        except (OSError, ValueError):
+            logger.exception(
+                'Не удалось обработать изображение рецепта %s', recipe.pk
+            )
+
+    def done(future):
+        try:
+            save_variants(recipe, future.result())
+        except Exception:
+            logger.exception(
+                'Не удалось обработать изображение рецепта %s', recipe.pk
+            )
+        finally:
+            connections.close_all()
+
+    def submit():
+        get_executor().submit(
+            render_variants,
+            str(settings.MEDIA_ROOT),
+            recipe.image.name,
+            settings.RECIPE_IMAGE_VARIANTS,
+            get_formats(),
+        ).add_done_callback(done)
+
+    if settings.IMAGE_PROCESSING_WORKERS:
+        transaction.on_commit(submit)
+    else:
+        transaction.on_commit(process)
@@ -0,0 +1,227 @@
+'''
+Management-команда на генерацию синтетического набора данных.
+'''
+
+import random
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscribe, Tag)
+from recipes.signals import recipes_changed, reference_data_changed
+from users.models import User
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ZipfChooser:
+    """Выбор элементов с вероятностью, обратной рангу в степени s."""
+
+    def __init__(self, rng, population, exponent):
+        self.rng = rng
+        self.population = population
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(population) + 1)
+        ))
+
+    def choice(self):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights
+        )[0]
+
+    def sample(self, count, exclude=None):
+        """До count различных элементов, кроме exclude."""
+        count = min(count, len(self.population) - (exclude is not None))
+        result = set()
+        for _ in range(count * 3):
+            if len(result) >= count:
+                break
+            item = self.choice()
+            if item != exclude:
+                result.add(item)
+        return result
+
+
+class Command(BaseCommand):
+    help = 'Генерация синтетических пользователей, рецептов и связей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Сколько ингредиентов создать, если таблица пуста.',
+        )
+        parser.add_argument('--max-ingredients-per-recipe', type=int,
+                            default=12)
+        parser.add_argument('--max-tags-per-recipe', type=int, default=3)
+        parser.add_argument('--subscriptions-per-user', type=int, default=10)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель степени распределения популярности.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help='Префикс имен создаваемых пользователей и тегов.',
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f'{options["prefix"]}{options["seed"]}_'
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Данные с префиксом {self.prefix} уже созданы, '
+                f'задайте другие --seed или --prefix.'
+            )
+        exponent = options['zipf']
+        ingredient_ids = self.get_ingredients(options['ingredients'])
+        tag_ids = self.create_tags(options['tags'])
+        user_ids = self.create_users(options['users'])
+        authors = ZipfChooser(self.rng, user_ids, exponent)
+        recipe_ids = self.create_recipes(options['recipes'], authors)
+        self.create_recipe_relations(
+            recipe_ids, ingredient_ids, tag_ids,
+            options['max_ingredients_per_recipe'],
+            options['max_tags_per_recipe'],
+        )
+        self.bulk_create(Subscribe, (
+            Subscribe(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in authors.sample(
+                options['subscriptions_per_user'], exclude=user_id
+            )
+        ))
+        recipes = ZipfChooser(self.rng, recipe_ids, exponent)
+        for model, per_user in ((Favorite, options['favorites_per_user']),
+                                (ShoppingCart, options['cart_per_user'])):
+            self.bulk_create(model, (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in recipes.sample(per_user)
+            ))
+        for model in (Ingredient, Tag):
+            reference_data_changed.send(sender=model)
+        recipes_changed.send(sender=Recipe, recipes=Recipe.objects.filter(
+            author__username__startswith=self.prefix
+        ).only('pk', 'author_id'))
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        call_command('rebuild_timelines', stdout=self.stdout)
+        call_command('reconcile_counters', stdout=self.stdout)
+
+    def bulk_create(self, model, objects, label=None):
+        created = 0
+        for chunk in chunked(objects, self.batch_size):
+            model.objects.bulk_create(chunk, ignore_conflicts=True)
+            created += len(chunk)
+        label = label or model._meta.verbose_name_plural
+        self.stdout.write(f'{label}: {created}.')
+
+    def get_ingredients(self, count):
+        if not Ingredient.objects.exists():
+            self.bulk_create(Ingredient, (
+                Ingredient(
+                    name=f'{self.prefix}ингредиент {number}',
+                    measurement_unit=self.rng.choice(('г', 'мл', 'шт.')),
+                )
+                for number in range(count)
+            ))
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def get_colors(self, count):
+        """count случайных цветов #RRGGBB, не занятых другими тегами."""
+        used = {
+            color.lower()
+            for color in Tag.objects.values_list('color', flat=True)
+        }
+        colors = []
+        while len(colors) < count:
+            color = f'#{self.rng.randrange(0x1000000):06x}'
+            if color not in used:
+                used.add(color)
+                colors.append(color)
+        return colors
+
+    def create_tags(self, count):
+        self.bulk_create(Tag, (
+            Tag(
+                name=f'{self.prefix}тег {number}',
+                color=color,
+                slug=f'{self.prefix}{number}',
+            )
+            for number, color in enumerate(self.get_colors(count))
+        ))
+        return list(Tag.objects.filter(
+            slug__startswith=self.prefix
+        ).values_list('id', flat=True))
+
+    def create_users(self, count):
+        password = make_password('synthetic-password')
+        self.bulk_create(User, (
+            User(
+                username=f'{self.prefix}{number}',
+                email=f'{self.prefix}{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            )
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=self.prefix
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipes(self, count, authors):
+        self.bulk_create(Recipe, (
+            Recipe(
+                author_id=authors.choice(),
+                name=f'Рецепт {number}',
+                text='Синтетическое описание рецепта. ' * 10,
+                image='recipes/images/synthetic.png',
+                cooking_time=self.rng.randint(5, 180),
+            )
+            for number in range(count)
+        ))
+        return list(Recipe.objects.filter(
+            author__username__startswith=self.prefix
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipe_relations(self, recipe_ids, ingredient_ids, tag_ids,
+                                max_ingredients, max_tags):
+        self.bulk_create(RecipeIngredient, (
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.rng.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.rng.sample(
+                ingredient_ids,
+                self.rng.randint(1, min(max_ingredients, len(ingredient_ids)))
+            )
+        ))
+        if not tag_ids:
+            return
+        through = Recipe.tags.through
+        self.bulk_create(through, (
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.rng.sample(
+                tag_ids, self.rng.randint(1, min(max_tags, len(tag_ids)))
+            )
+        ), label='Теги рецептов')
@@ -7,6 +7,7 @@ import csv
 from django.core.management.base import BaseCommand
 
 from recipes.models import Ingredient
+from recipes.signals import reference_data_changed
 
 
 class Command(BaseCommand):
@@ -28,3 +29,4 @@ class Command(BaseCommand):
                 except ValueError:
                     print('Несоответствие данных игнорировано.')
             Ingredient.objects.bulk_create(ingredients)
+        reference_data_changed.send(sender=Ingredient)
@@ -7,6 +7,7 @@ import csv
 from django.core.management.base import BaseCommand
 
 from recipes.models import Tag
+from recipes.signals import reference_data_changed
 
 
 class Command(BaseCommand):
@@ -29,3 +30,4 @@ class Command(BaseCommand):
                 except ValueError:
                     print('Несоответствие данных игнорировано.')
             Tag.objects.bulk_create(tags)
+        reference_data_changed.send(sender=Tag)
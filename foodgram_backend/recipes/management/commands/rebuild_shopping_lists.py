@@ -0,0 +1,75 @@
+'''
+Management-команда на пересборку агрегированных списков покупок.
+'''
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingListItem
+
+
+def get_expected_totals():
+    """Списки покупок, посчитанные заново по рецептам в корзинах."""
+    return {
+        (row['recipe__shopping__user'], row['ingredient']): row['total']
+        for row in RecipeIngredient.objects.filter(
+            recipe__shopping__isnull=False
+        ).values(
+            'recipe__shopping__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+    }
+
+
+class Command(BaseCommand):
+    help = 'Пересборка и проверка агрегированных списков покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить списки с пересчитанными, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        expected = get_expected_totals()
+        if options['check']:
+            stored = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in
+                ShoppingListItem.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount'
+                )
+            }
+            mismatched = [
+                key for key in expected.keys() | stored.keys()
+                if expected.get(key) != stored.get(key)
+            ]
+            for user_id, ingredient_id in sorted(mismatched):
+                self.stdout.write(
+                    f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                    f'ожидается {expected.get((user_id, ingredient_id))}, '
+                    f'сохранено {stored.get((user_id, ingredient_id))}.'
+                )
+            if mismatched:
+                raise CommandError(
+                    f'Расхождений в списках покупок: {len(mismatched)}.'
+                )
+            self.stdout.write('Списки покупок согласованы.')
+            return
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                [
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for (user_id, ingredient_id), amount in expected.items()
+                ],
+                batch_size=1000,
+            )
+        self.stdout.write(
+            f'Списки покупок пересобраны, позиций: {len(expected)}.'
+        )
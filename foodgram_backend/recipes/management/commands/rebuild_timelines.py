@@ -0,0 +1,43 @@
+'''
+Management-команда на пересборку лент подписок.
+'''
+
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Subscribe, TimelineEntry
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Пересборка лент подписок по подпискам и рецептам.'
+
+    def handle(self, *args, **options):
+        pull_author_ids = TimelineEntry.objects.pull_author_ids(
+            Subscribe.objects
+        )
+        entries = (
+            TimelineEntry(
+                user_id=user_id, recipe_id=recipe_id, pub_date=pub_date
+            )
+            for user_id, recipe_id, pub_date in Subscribe.objects.filter(
+                author__recipes__isnull=False
+            ).exclude(
+                author_id__in=pull_author_ids
+            ).values_list(
+                'user_id', 'author__recipes', 'author__recipes__pub_date'
+            ).order_by().iterator()
+        )
+        created = 0
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+            while True:
+                chunk = list(islice(entries, BATCH_SIZE))
+                if not chunk:
+                    break
+                TimelineEntry.objects.bulk_create(chunk)
+                created += len(chunk)
+        self.stdout.write(f'Ленты подписок пересобраны, записей: {created}.')
@@ -0,0 +1,57 @@
+'''
+Management-команда на сверку счетчиков избранного и списков покупок.
+'''
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.signals import recipes_changed
+
+
+def count_subquery(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Сверка и исправление счетчиков популярности рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти расхождения, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        counters = {
+            model.recipe_counter: count_subquery(model)
+            for model in (Favorite, ShoppingCart)
+        }
+        drifted = Recipe.objects.filter(Q(
+            *(~Q(**{field: actual}) for field, actual in counters.items()),
+            _connector=Q.OR,
+        )).order_by()
+        if options['check']:
+            total = drifted.count()
+            if total:
+                raise CommandError(
+                    f'Расхождений в счетчиках рецептов: {total}.'
+                )
+            self.stdout.write('Счетчики рецептов согласованы.')
+            return
+        # Счетчики пересчитываются одним UPDATE с подзапросами, как в
+        # миграции 0009: значения вычисляются в момент записи, поэтому
+        # параллельные атомарные изменения счетчиков не затираются.
+        with transaction.atomic():
+            recipes = list(drifted.only('pk', 'author_id'))
+            total = drifted.update(updated_at=timezone.now(), **counters)
+            recipes_changed.send(sender=Recipe, recipes=recipes)
+        self.stdout.write(f'Исправлено счетчиков рецептов: {total}.')
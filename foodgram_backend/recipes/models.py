@@ -1,8 +1,14 @@
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from django.conf import settings
 
 from users.models import User
+from .search import search_postgresql, search_sqlite
 
 
 class Ingredient(models.Model):
@@ -50,6 +56,82 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Выборки рецептов для отображения."""
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами избранного и списка покупок."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+    def for_list(self, user, fields=None):
+        """
+        Рецепты со связанными данными для списка и деталей.
+
+        fields — множество полей ответа или None для всех полей:
+        связанные объекты и тяжелые колонки, которые не попадут
+        в ответ, не загружаются.
+        """
+        def requested(name):
+            return fields is None or name in fields
+
+        queryset = self.defer('search_vector', *(
+            name for name in ('text', 'image_variants')
+            if not requested(name)
+        ))
+        if requested('author'):
+            queryset = queryset.select_related('author')
+        if requested('tags'):
+            queryset = queryset.prefetch_related('tags')
+        if requested('ingredients'):
+            queryset = queryset.prefetch_related(models.Prefetch(
+                'ingredient',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ),
+            ))
+        return queryset.with_user_flags(user)
+
+    def search(self, text):
+        """
+        Полнотекстовый поиск по названию и тексту рецепта.
+
+        Рецепты аннотируются релевантностью search_rank и упорядочены
+        по ней, при равной релевантности — от новых к старым.
+        """
+        if connections[self.db].vendor == 'postgresql':
+            queryset = search_postgresql(self, text)
+        else:
+            queryset = search_sqlite(self, text)
+        return queryset.order_by('-search_rank', '-pub_date', '-id')
+
+    def popular(self):
+        """Рецепты по числу добавлений в избранное."""
+        return self.order_by('-favorites_count', '-pub_date', '-id')
+
+
+COUNTER_FIELDS = ('favorites_count', 'shopping_count')
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -65,6 +147,11 @@ class Recipe(models.Model):
         verbose_name='Изображение рецепта',
         upload_to='recipes/images',
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+    )
     text = models.TextField(verbose_name='Текст рецепта',)
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -94,15 +181,63 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', '-id'),
+                name='recipe_popular_idx',
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Счетчики меняет только атомарный UPDATE в update_counters,
+        поэтому сохранение существующего рецепта их не записывает и не
+        затирает устаревшими значениями параллельные изменения.
+        """
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class RecipeIngredient(models.Model):
     amount = models.PositiveSmallIntegerField(
@@ -146,6 +281,35 @@ class RecipeIngredient(models.Model):
         return f'{self.ingredient} в {self.recipe}'
 
 
+class SubscribeQuerySet(models.QuerySet):
+    """Выборки подписок для отображения."""
+
+    def with_recipes(self, recipes_limit=None):
+        """
+        Подписки с автором, числом его рецептов и последними рецептами.
+
+        Рецепты авторов загружаются одним запросом: при заданном
+        recipes_limit коррелированный подзапрос оставляет по
+        recipes_limit последних рецептов каждого автора.
+        """
+        recipes = Recipe.objects.order_by('-pub_date')
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=models.Subquery(
+                Recipe.objects.filter(
+                    author=models.OuterRef('author')
+                ).order_by('-pub_date').values('pk')[:recipes_limit]
+            ))
+        return self.select_related('author').annotate(
+            recipes_count=models.Count('author__recipes'),
+        ).prefetch_related(
+            models.Prefetch(
+                'author__recipes',
+                queryset=recipes,
+                to_attr='limited_recipes',
+            ),
+        )
+
+
 class Subscribe(models.Model):
     user = models.ForeignKey(
         User,
@@ -160,6 +324,8 @@ class Subscribe(models.Model):
         related_name='author',
     )
 
+    objects = SubscribeQuerySet.as_manager()
+
     class Meta:
         ordering = ('id',)
         verbose_name = 'Подписка'
@@ -172,6 +338,90 @@ class Subscribe(models.Model):
         ]
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """
+    Добавление и удаление рецептов пользователя.
+
+    Вместе со строками меняется счетчик рецепта, имя которого задано
+    в атрибуте recipe_counter модели; расхождения исправляет команда
+    reconcile_counters.
+    """
+
+    def update_counters(self, recipe_ids, delta):
+        """
+        Меняет счетчики рецептов одним UPDATE.
+
+        Счетчик не опускается ниже нуля, даже если строки уже удалены
+        параллельным запросом. update() не отправляет сигналов, поэтому
+        об изменении рецептов сообщает recipes_changed: по нему
+        сбрасывается кэш ответов.
+        """
+        from .signals import recipes_changed
+
+        if recipe_ids:
+            field = self.model.recipe_counter
+            recipes = Recipe.objects.filter(pk__in=recipe_ids)
+            recipes.update(
+                updated_at=timezone.now(),
+                **{field: Greatest(models.F(field) + delta, 0)}
+            )
+            recipes_changed.send(
+                sender=Recipe, recipes=recipes.only('pk', 'author_id')
+            )
+
+    def lock_user(self, user):
+        """
+        Блокирует строку пользователя до конца транзакции, чтобы его
+        добавления и удаления рецептов выполнялись по очереди.
+        """
+        list(User.objects.select_for_update().filter(
+            pk=user.pk
+        ).values_list('pk', flat=True))
+
+    def add_recipe(self, user, recipe):
+        """Добавляет рецепт одним INSERT; повтор вызывает IntegrityError."""
+        with transaction.atomic():
+            self.lock_user(user)
+            obj = self.create(user=user, recipe=recipe)
+            self.update_counters([recipe.pk], 1)
+        return obj
+
+    def add_recipes(self, user, recipe_ids):
+        """
+        Добавляет рецепты, которых у пользователя еще нет, и возвращает
+        id действительно добавленных.
+
+        Пока строка пользователя заблокирована, параллельный запрос не
+        добавит те же рецепты между проверкой и вставкой, поэтому
+        счетчики не увеличатся дважды.
+        """
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        with transaction.atomic(savepoint=False):
+            self.lock_user(user)
+            existing = set(self.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True))
+            added = [pk for pk in recipe_ids if pk not in existing]
+            self.bulk_create(
+                [self.model(user=user, recipe_id=pk) for pk in added],
+                ignore_conflicts=True,
+            )
+            self.update_counters(added, 1)
+        return added
+
+    def remove_recipes(self, user, recipe_ids):
+        """Удаляет рецепты одним запросом и возвращает id удаленных."""
+        with transaction.atomic(savepoint=False):
+            self.lock_user(user)
+            removed = list(self.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True))
+            if removed:
+                self.filter(user=user, recipe_id__in=removed).delete()
+                self.update_counters(removed, -1)
+        return removed
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -186,6 +436,10 @@ class Favorite(models.Model):
         related_name='favorites',
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
+    recipe_counter = 'favorites_count'
+
     class Meta:
         ordering = ('id',)
         constraints = [
@@ -198,6 +452,23 @@ class Favorite(models.Model):
         verbose_name_plural = 'Объекты избранного'
 
 
+class ShoppingCartQuerySet(UserRecipeQuerySet):
+    """Рецепты для покупок вместе с агрегированным списком покупок."""
+
+    def add_recipes(self, user, recipe_ids):
+        with transaction.atomic(savepoint=False):
+            added = super().add_recipes(user, recipe_ids)
+            ShoppingListItem.objects.add_recipes(user.pk, added)
+        return added
+
+    def remove_recipes(self, user, recipe_ids):
+        """Удаляет рецепты и вычитает их ингредиенты из списка покупок."""
+        with transaction.atomic(savepoint=False):
+            removed = super().remove_recipes(user, recipe_ids)
+            ShoppingListItem.objects.add_recipes(user.pk, removed, sign=-1)
+        return removed
+
+
 class ShoppingCart(models.Model):
     user = models.ForeignKey(
         User,
@@ -212,6 +483,10 @@ class ShoppingCart(models.Model):
         related_name='shopping',
     )
 
+    objects = ShoppingCartQuerySet.as_manager()
+
+    recipe_counter = 'shopping_count'
+
     class Meta:
         ordering = ('id',)
         constraints = [
@@ -222,3 +497,325 @@ class ShoppingCart(models.Model):
         ]
         verbose_name = 'Рецепт для покупок'
         verbose_name_plural = 'Рецепты для покупок'
+
+
+class ShoppingListQuerySet(models.QuerySet):
+    """Инкрементальное обновление агрегированных списков покупок."""
+
+    def apply_changes(self, user_ids, changes):
+        """
+        Прибавляет к спискам пользователей изменения количеств.
+
+        changes — словарь {id ингредиента: изменение количества}.
+        Все изменения применяются одним UPDATE с CASE по ингредиенту;
+        позиции с нулевым количеством удаляются.
+        """
+        changes = {pk: delta for pk, delta in changes.items() if delta}
+        user_ids = list(user_ids)
+        if not user_ids or not changes:
+            return
+        with transaction.atomic(savepoint=False):
+            self.bulk_create(
+                [
+                    self.model(
+                        user_id=user_id, ingredient_id=ingredient_id, amount=0
+                    )
+                    for user_id in user_ids
+                    for ingredient_id, delta in changes.items()
+                    if delta > 0
+                ],
+                ignore_conflicts=True,
+            )
+            self.filter(
+                user_id__in=user_ids, ingredient_id__in=changes
+            ).update(amount=models.F('amount') + models.Case(
+                *(
+                    models.When(ingredient_id=pk, then=models.Value(delta))
+                    for pk, delta in changes.items()
+                ),
+                default=models.Value(0),
+                output_field=models.IntegerField(),
+            ))
+            self.filter(
+                user_id__in=user_ids,
+                ingredient_id__in=changes,
+                amount__lte=0,
+            ).delete()
+
+    def add_recipes(self, user_id, recipe_ids, sign=1):
+        """
+        Учитывает рецепты, добавленные в список покупок (или удаленные).
+
+        Количества ингредиентов всех рецептов суммируются заранее,
+        поэтому число запросов не зависит от числа рецептов.
+        """
+        if not recipe_ids:
+            return
+        changes = defaultdict(int)
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id', 'amount'):
+            changes[ingredient_id] += sign * amount
+        self.apply_changes([user_id], changes)
+
+    def add_recipe(self, user_id, recipe_id, sign=1):
+        """Учитывает рецепт, добавленный в список покупок (или удаленный)."""
+        self.add_recipes(user_id, [recipe_id], sign)
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.add_recipe(user_id, recipe_id, sign=-1)
+
+    def delete_recipe(self, recipe):
+        """Вычитает удаляемый рецепт из всех списков покупок с ним."""
+        user_ids = list(recipe.shopping.values_list('user_id', flat=True))
+        if user_ids:
+            self.apply_changes(user_ids, {
+                ingredient_id: -amount
+                for ingredient_id, amount in recipe.ingredient.values_list(
+                    'ingredient_id', 'amount'
+                )
+            })
+
+    def update_recipe(self, recipe, old_amounts, new_amounts):
+        """
+        Переносит изменение ингредиентов рецепта в списки покупок.
+
+        old_amounts и new_amounts — словари {id ингредиента: количество}
+        до и после изменения.
+        """
+        changes = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+        self.apply_changes(
+            recipe.shopping.values_list('user_id', flat=True), changes
+        )
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    amount = models.IntegerField(verbose_name='Количество')
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('id',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient',),
+                name='unique_shopping_list_item',
+            ),
+        ]
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.amount} ({self.user})'
+
+
+class TimelineQuerySet(models.QuerySet):
+    """
+    Ленты подписок, заполняемые при публикации рецепта.
+
+    Рецепты автора копируются в ленты подписчиков, пока у него меньше
+    FEED_FANOUT_LIMIT подписчиков, не больше FEED_BACKFILL_LIMIT рецептов
+    и меньше FEED_TIMELINE_ROWS_LIMIT записей во всех лентах (подписчики,
+    умноженные на рецепты). Рецепты остальных авторов в ленты не
+    копируются и читаются из таблицы рецептов при запросе ленты, поэтому
+    и рассылка, и заполнение ленты при подписке ограничены.
+
+    Режим автора не хранится и не кэшируется: и запись, и чтение ленты
+    определяют его по текущему числу подписчиков и рецептов, поэтому
+    процессы не расходятся в том, где искать рецепты автора.
+    """
+
+    @staticmethod
+    def is_pull_author(followers, recipes):
+        """Рецепты автора читаются при запросе ленты, а не копируются."""
+        return (
+            followers >= settings.FEED_FANOUT_LIMIT
+            or recipes > settings.FEED_BACKFILL_LIMIT
+            or followers * recipes >= settings.FEED_TIMELINE_ROWS_LIMIT
+        )
+
+    def author_stats(self, subscriptions):
+        """
+        Число подписчиков и рецептов авторов из подписок одним запросом:
+        {id автора: (подписчики, рецепты)}.
+        """
+        recipes = Recipe.objects.filter(
+            author=models.OuterRef('author')
+        ).order_by().values('author').annotate(
+            total=models.Count('pk')
+        ).values('total')
+        return {
+            author_id: (followers, recipes)
+            for author_id, followers, recipes in subscriptions.values(
+                'author'
+            ).annotate(
+                followers=models.Count('id'),
+                recipes=Coalesce(models.Subquery(recipes), 0),
+            ).values_list('author', 'followers', 'recipes').order_by()
+        }
+
+    def pull_author_ids(self, subscriptions):
+        """Id авторов из подписок, рецепты которых не копируются в ленты."""
+        return {
+            author_id
+            for author_id, stats in self.author_stats(subscriptions).items()
+            if self.is_pull_author(*stats)
+        }
+
+    def fan_out(self, recipes):
+        """
+        Добавляет рецепты в ленты подписчиков их авторов.
+
+        Рецепты уже сохранены, поэтому авторы, которых пачка рецептов
+        перевела в режим чтения при запросе, в ленты не рассылаются, как
+        и авторы без подписчиков.
+        """
+        stats = self.author_stats(Subscribe.objects.filter(
+            author_id__in={recipe.author_id for recipe in recipes}
+        ))
+        recipes = [
+            recipe for recipe in recipes
+            if recipe.author_id in stats
+            and not self.is_pull_author(*stats[recipe.author_id])
+        ]
+        if not recipes:
+            return
+        followers = defaultdict(list)
+        for user_id, author_id in Subscribe.objects.filter(
+            author_id__in={recipe.author_id for recipe in recipes}
+        ).values_list('user_id', 'author_id').order_by():
+            followers[author_id].append(user_id)
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, recipe_id=recipe.pk,
+                    pub_date=recipe.pub_date,
+                )
+                for recipe in recipes
+                for user_id in followers[recipe.author_id]
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    def follow(self, user_id, author_id):
+        """
+        Переносит в ленту подписчика уже опубликованные рецепты.
+
+        Копируется не больше FEED_BACKFILL_LIMIT последних рецептов: у
+        авторов, у которых их больше, лента читается при запросе.
+        """
+        if self.pull_author_ids(Subscribe.objects.filter(author_id=author_id)):
+            return
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+                for pk, pub_date in Recipe.objects.filter(
+                    author_id=author_id
+                ).order_by('-pub_date', '-pk').values_list(
+                    'pk', 'pub_date'
+                )[:settings.FEED_BACKFILL_LIMIT]
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    def unfollow(self, user_id, author_id):
+        self.filter(user_id=user_id, recipe__author_id=author_id).delete()
+        self.push_author(author_id)
+
+    def push_author(self, author_id):
+        """
+        Дополняет ленты подписчиков рецептами автора, если после отписки
+        или удаления рецептов он снова рассылается по лентам.
+
+        Пока автор читался при запросе ленты, его новые рецепты в ленты
+        не копировались; без дополнения они пропали бы из лент. Неполные
+        ленты находятся сравнением числа записей с подписчиками,
+        умноженными на рецепты, поэтому удаление нескольких рецептов
+        сразу тоже учитывается.
+        """
+        stats = self.author_stats(
+            Subscribe.objects.filter(author_id=author_id)
+        ).get(author_id)
+        if stats is None or self.is_pull_author(*stats):
+            return
+        followers, total = stats
+        if self.filter(
+            recipe__author_id=author_id
+        ).count() >= followers * total:
+            return
+        recipes = list(Recipe.objects.filter(
+            author_id=author_id
+        ).values_list('pk', 'pub_date').order_by())
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+                for user_id in Subscribe.objects.filter(
+                    author_id=author_id
+                ).values_list('user_id', flat=True).order_by()
+                for pk, pub_date in recipes
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    objects = TimelineQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe',),
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+
+    def __str__(self):
+        return f'{self.recipe} ({self.user})'
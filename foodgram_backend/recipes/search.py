@@ -0,0 +1,93 @@
+'''
+Полнотекстовый поиск рецептов по названию и описанию.
+
+В PostgreSQL поисковый вектор хранится в поле Recipe.search_vector:
+его пересчитывает триггер при изменении названия или текста, а поиск
+идет по GIN-индексу (миграция 0007). В SQLite, для разработки и тестов,
+используется внешняя таблица FTS5 с триггерами синхронизации.
+'''
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import models
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+RECIPE_TABLE = 'recipes_recipe'
+WORD = re.compile(r'\w+')
+
+SQLITE_SCHEMA = (
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, text,
+        content='{RECIPE_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF name, text ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    ''',
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+
+
+def install_sqlite_search(connection):
+    """
+    Создает таблицу FTS5 и триггеры и перестраивает индекс.
+
+    Вызывается после каждой миграции: SQLite пересоздает таблицу
+    рецептов при изменении схемы, и триггеры при этом теряются.
+    """
+    if RECIPE_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for statement in SQLITE_SCHEMA:
+            cursor.execute(statement)
+
+
+def search_postgresql(queryset, text):
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(models.F('search_vector'), query)
+    )
+
+
+def search_sqlite(queryset, text):
+    """Поиск по FTS5: каждое слово запроса ищется как префикс."""
+    words = WORD.findall(text)
+    if not words:
+        return queryset.annotate(search_rank=models.Value(
+            0.0, output_field=models.FloatField()
+        )).none()
+    match = ' '.join(f'"{word}"*' for word in words)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,),
+    )).annotate(search_rank=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = {RECIPE_TABLE}.id',
+        (match,),
+        output_field=models.FloatField(),
+    ))
@@ -0,0 +1,95 @@
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from users.models import User
+
+from .models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+                     ShoppingListItem, Subscribe, Tag, TimelineEntry)
+from .search import install_sqlite_search
+
+# Рецепты изменены в обход save(): update(), bulk_create() или
+# bulk_update(). По нему сбрасывается кэш ответов анонимам, поэтому его
+# должен отправлять каждый такой путь записи: счетчики в
+# UserRecipeQuerySet, импорт рецептов, варианты изображений, команды
+# reconcile_counters и generate_data. Изменения через save() и delete()
+# рецептов, их ингредиентов, тегов и авторов учитываются сигналами
+# моделей.
+recipes_changed = Signal()
+
+# Теги или ингредиенты (sender) загружены в обход save().
+reference_data_changed = Signal()
+
+# Поля автора, которые входят в представление рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.user_id, instance.recipe_id
+        )
+
+
+# Рецепты из корзины удаляет ShoppingCart.objects.remove_recipes: она
+# вычитает их из списка покупок одним набором запросов. Обработчик
+# удаления корзины отключил бы быстрое удаление, поэтому здесь
+# учитывается только удаление самого рецепта.
+@receiver(pre_delete, sender=Recipe)
+def remove_from_shopping_lists(instance, **kwargs):
+    ShoppingListItem.objects.delete_recipe(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        TimelineEntry.objects.fan_out([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def push_recipe_author(instance, **kwargs):
+    TimelineEntry.objects.push_author(instance.author_id)
+
+
+@receiver(post_save, sender=Subscribe)
+def fill_timeline(instance, created, **kwargs):
+    if created:
+        TimelineEntry.objects.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def clear_timeline(instance, **kwargs):
+    TimelineEntry.objects.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def touch_recipe(instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_related_recipes(instance, **kwargs):
+    """Изменение тега или ингредиента меняет и представление рецептов."""
+    instance.recipes.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    instance.recipes.update(updated_at=timezone.now())
+
+
+@receiver(post_migrate)
+def install_recipe_search(sender, using, **kwargs):
+    connection = connections[using]
+    if sender.name == 'recipes' and connection.vendor == 'sqlite':
+        install_sqlite_search(connection)
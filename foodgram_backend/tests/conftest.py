@@ -0,0 +1,139 @@
+import io
+import random
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscribe, Tag)
+from users.models import User
+
+USERS = 30
+RECIPES_PER_AUTHOR = 8
+INGREDIENTS = 300
+INGREDIENTS_PER_RECIPE = 10
+SUBSCRIPTIONS_PER_USER = 6
+FAVORITES_PER_USER = 15
+CART_PER_USER = 8
+
+
+def seed():
+    """
+    Набор данных, похожий на боевой, общий для всех тестов сессии.
+
+    Объекты перечитываются после bulk_create, потому что не все СУБД
+    возвращают первичные ключи созданных строк.
+    """
+    rng = random.Random(0)
+    Tag.objects.bulk_create([
+        Tag(name='Завтрак', color='#82ac64', slug='breakfast'),
+        Tag(name='Обед', color='#ff6e12', slug='lunch'),
+        Tag(name='Ужин', color='#b49adf', slug='dinner'),
+    ])
+    tags = list(Tag.objects.order_by('id'))
+    Ingredient.objects.bulk_create([
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(INGREDIENTS)
+    ])
+    ingredients = list(Ingredient.objects.order_by('id'))
+    User.objects.bulk_create([
+        User(
+            username=f'user{number}',
+            email=f'user{number}@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        for number in range(USERS)
+    ])
+    users = list(User.objects.order_by('id'))
+    Recipe.objects.bulk_create([
+        Recipe(
+            author=author,
+            name=f'Рецепт {author.username} {number}',
+            text='Описание рецепта. ' * 20,
+            image='recipes/images/recipe.png',
+            cooking_time=rng.randint(5, 120),
+        )
+        for author in users
+        for number in range(RECIPES_PER_AUTHOR)
+    ])
+    recipes = list(Recipe.objects.select_related('author').order_by('id'))
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in rng.sample(tags, 2)
+    ])
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                         amount=rng.randint(1, 500))
+        for recipe in recipes
+        for ingredient in rng.sample(ingredients, INGREDIENTS_PER_RECIPE)
+    ])
+    viewer, stranger = users[0], users[-1]
+    others = [user for user in users if user not in (viewer, stranger)]
+    Subscribe.objects.bulk_create([
+        Subscribe(user=user, author=author)
+        for user in users
+        for author in rng.sample(
+            [other for other in others if other != user],
+            SUBSCRIPTIONS_PER_USER,
+        )
+    ])
+    call_command('rebuild_timelines', stdout=io.StringIO())
+    foreign = [recipe for recipe in recipes
+               if recipe.author not in (viewer, stranger)]
+    Favorite.objects.bulk_create([
+        Favorite(user=user, recipe=recipe)
+        for user in users
+        for recipe in rng.sample(foreign, FAVORITES_PER_USER)
+    ])
+    for user in users:
+        for recipe in rng.sample(foreign, CART_PER_USER):
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+    call_command('reconcile_counters', stdout=io.StringIO())
+    return SimpleNamespace(
+        viewer=viewer,
+        token=Token.objects.create(user=viewer).key,
+        author=stranger,
+        recipe=stranger.recipes.first(),
+        own_recipe=viewer.recipes.first(),
+        followed=viewer.subscriber.first().author,
+        favorite=viewer.favorites.first().recipe,
+        in_cart=viewer.shopping.first().recipe,
+        tag=tags[0],
+        ingredient=ingredients[0],
+        ingredients=ingredients,
+    )
+
+
+@pytest.fixture(scope='session')
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        return seed()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.METRICS_DIR = str(tmp_path / 'metrics')
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def authorized_client(dataset):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {dataset.token}')
+    return client
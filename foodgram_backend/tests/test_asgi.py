@@ -0,0 +1,41 @@
+'''
+Под ASGI промежуточные слои не выстраивают запросы в очередь.
+'''
+
+import asyncio
+import time
+
+import pytest
+from django.http import HttpResponse
+from django.test import AsyncClient
+from django.urls import path
+
+DELAY = 0.3
+CONCURRENCY = 4
+
+
+async def slow_view(request):
+    await asyncio.sleep(DELAY)
+    return HttpResponse('ok')
+
+
+urlpatterns = [path('api/slow/', slow_view)]
+
+
+@pytest.mark.urls(__name__)
+def test_concurrent_requests_run_in_parallel(settings):
+    settings.REPLICA_DATABASES = ['replica1']
+    client = AsyncClient()
+
+    async def fetch_all():
+        return await asyncio.gather(
+            *(client.get('/api/slow/') for _ in range(CONCURRENCY))
+        )
+
+    start = time.perf_counter()
+    responses = asyncio.run(fetch_all())
+    elapsed = time.perf_counter() - start
+    assert [response.status_code for response in responses] == (
+        [200] * CONCURRENCY
+    )
+    assert elapsed < DELAY * 2
@@ -0,0 +1,119 @@
+'''
+Async-версии маршрутов чтения отвечают так же, как синхронные.
+'''
+
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.http import StreamingHttpResponse
+from django.urls import include, path
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.async_views import (ASGIHandler, async_patterns, async_view,
+                             run_view)
+from api.urls import router_v1
+
+urlpatterns = [path('api/', include(async_patterns(router_v1.urls)))]
+
+
+def get_view(name):
+    return next(
+        pattern.callback for pattern in router_v1.urls if pattern.name == name
+    )
+
+
+def test_only_read_routes_are_async():
+    patterns = async_patterns(router_v1.urls)
+    async_names = {
+        pattern.name for pattern in patterns
+        if asyncio.iscoroutinefunction(pattern.callback)
+    }
+    assert async_names == {
+        'tags-list', 'ingredients-list', 'recipes-list', 'recipes-detail',
+        'recipes-download-shopping-cart',
+    }
+    assert all(
+        pattern.callback.csrf_exempt for pattern in patterns
+        if pattern.name in async_names
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, url, kwargs', (
+    ('tags-list', '/api/tags/', {}),
+    ('ingredients-list', '/api/ingredients/?name=ингр', {}),
+    ('recipes-list', '/api/recipes/?tags=lunch', {}),
+    ('recipes-detail', '/api/recipes/{pk}/', {'pk': 'recipe'}),
+    ('recipes-download-shopping-cart',
+     '/api/recipes/download_shopping_cart/', {}),
+))
+def test_async_view_matches_sync(dataset, name, url, kwargs):
+    kwargs = {key: getattr(dataset, value).pk for key, value in kwargs.items()}
+    url = url.format(**kwargs)
+    view = get_view(name)
+    responses = []
+    for call in (view, async_to_sync(async_view(view))):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, dataset.viewer)
+        response = call(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        responses.append(response)
+    sync, asynchronous = responses
+    assert sync.status_code == asynchronous.status_code == 200
+    assert b''.join(sync) == b''.join(asynchronous)
+
+
+def test_streaming_response_is_not_buffered():
+    produced = []
+
+    def parts():
+        for number in range(3):
+            produced.append(number)
+            yield b'part'
+
+    response = run_view(lambda request: StreamingHttpResponse(parts()), None)
+    assert produced == []
+
+    async def read():
+        return [part async for part in response.async_streaming_content]
+
+    assert async_to_sync(read)() == [b'part'] * 3
+    assert produced == [0, 1, 2]
+
+
+@pytest.mark.django_db
+@pytest.mark.urls(__name__)
+def test_shopping_list_is_streamed_over_asgi(dataset):
+    scope = {
+        'type': 'http',
+        'method': 'GET',
+        'path': '/api/recipes/download_shopping_cart/',
+        'query_string': b'',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'authorization', f'Token {dataset.token}'.encode()),
+        ],
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    async_to_sync(ASGIHandler())(scope, receive, send)
+    start, *body = messages
+    assert start['status'] == 200
+    assert len(body) > 2
+    assert all(message['more_body'] for message in body[:-1])
+    assert not body[-1].get('more_body')
+
+    request = APIRequestFactory().get(scope['path'])
+    force_authenticate(request, dataset.viewer)
+    view = get_view('recipes-download-shopping-cart')
+    assert b''.join(
+        message.get('body', b'') for message in body
+    ) == b''.join(view(request))
@@ -0,0 +1,27 @@
+'''
+Массовое создание рецептов: ошибки в данных дают 400, а не 500.
+'''
+
+import pytest
+
+from recipes.models import Recipe
+from .test_performance import recipe_payload
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ingredients', (5, 'абв', None, {'id': 1}))
+def test_malformed_ingredients_are_rejected(authorized_client, dataset,
+                                            ingredients):
+    recipes = Recipe.objects.count()
+    payload = [
+        recipe_payload(dataset),
+        {**recipe_payload(dataset), 'ingredients': ingredients},
+    ]
+    response = authorized_client.post(
+        '/api/recipes/bulk/', payload, format='json'
+    )
+    assert response.status_code == 400
+    first, second = response.json()
+    assert not first
+    assert 'ingredients' in second
+    assert Recipe.objects.count() == recipes
@@ -0,0 +1,76 @@
+'''
+Счетчики популярности меняются только атомарными UPDATE.
+'''
+
+import io
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+@pytest.mark.django_db
+def test_saving_stale_recipe_keeps_counters(dataset):
+    recipe = Recipe.objects.get(pk=dataset.recipe.pk)
+    favorites, shopping = recipe.favorites_count, recipe.shopping_count
+    Favorite.objects.update_counters([recipe.pk], 1)
+    ShoppingCart.objects.update_counters([recipe.pk], 1)
+    recipe.name = 'Новое название'
+    recipe.save()
+    recipe.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert recipe.favorites_count == favorites + 1
+    assert recipe.shopping_count == shopping + 1
+
+
+@pytest.mark.django_db
+def test_counters_do_not_go_below_zero(dataset):
+    recipe = dataset.author.recipes.filter(favorites_count=0).first()
+    Favorite.objects.update_counters([recipe.pk], -1)
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 0
+
+
+@pytest.mark.django_db
+def test_reconcile_fixes_drift_and_drops_cached_responses(
+    anonymous_client, dataset, settings, django_capture_on_commit_callbacks
+):
+    settings.ANONYMOUS_CACHE = True
+    recipe = dataset.recipe
+    favorites = Favorite.objects.filter(recipe=recipe).count()
+    url = f'/api/recipes/{recipe.pk}/'
+    etag = anonymous_client.get(url)['ETag']
+    Recipe.objects.filter(pk=recipe.pk).update(favorites_count=favorites + 5)
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('reconcile_counters', stdout=io.StringIO())
+    call_command('reconcile_counters', '--check', stdout=io.StringIO())
+    response = anonymous_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['favorites_count'] == favorites
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model', (Favorite, ShoppingCart))
+def test_admin_changes_keep_counters(admin_client, dataset, model):
+    name = model._meta.model_name
+    recipe = dataset.author.recipes.exclude(pk__in=model.objects.filter(
+        user=dataset.viewer
+    ).values('recipe')).first()
+    counter = model.recipe_counter
+    before = getattr(recipe, counter)
+    response = admin_client.post(
+        f'/admin/recipes/{name}/add/',
+        {'user': dataset.viewer.pk, 'recipe': recipe.pk},
+    )
+    assert response.status_code == 302
+    recipe.refresh_from_db()
+    assert getattr(recipe, counter) == before + 1
+    obj = model.objects.get(user=dataset.viewer, recipe=recipe)
+    response = admin_client.post(
+        f'/admin/recipes/{name}/{obj.pk}/delete/', {'post': 'yes'}
+    )
+    assert response.status_code == 302
+    recipe.refresh_from_db()
+    assert getattr(recipe, counter) == before
+    assert not model.objects.filter(pk=obj.pk).exists()
@@ -0,0 +1,33 @@
+'''
+Курсорная навигация по рецептам.
+'''
+
+import pytest
+
+from recipes.models import Recipe
+
+
+@pytest.mark.django_db
+def test_cursor_pages_cover_all_recipes(anonymous_client, dataset):
+    url, ids = '/api/recipes/?pagination=cursor&limit=100', []
+    while url:
+        data = anonymous_client.get(url).json()
+        ids += [recipe['id'] for recipe in data['results']]
+        url = data['next']
+    assert ids == list(
+        Recipe.objects.order_by('-pub_date', '-pk').values_list(
+            'pk', flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', (
+    'ordering=popular', 'search=рецепт',
+))
+def test_cursor_rejects_other_orderings(anonymous_client, dataset, params):
+    response = anonymous_client.get(
+        f'/api/recipes/?pagination=cursor&{params}'
+    )
+    assert response.status_code == 400
+    assert 'cursor' in response.json()
@@ -0,0 +1,92 @@
+'''
+Скачивание списка покупок: заголовки и содержимое файлов.
+'''
+
+import csv
+import io
+
+import pytest
+
+from api.shopping_list import FORMATS
+from recipes.models import Ingredient, ShoppingCart
+
+from .test_shopping_list import expected_shopping_list
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+def download(client, file_format):
+    response = client.get(URL, {'file_format': file_format})
+    assert response.status_code == 200
+    return response, b''.join(response.streaming_content)
+
+
+def expected_rows(user):
+    totals = expected_shopping_list(user)
+    return sorted(
+        (ingredient.name, str(totals[ingredient.pk]),
+         ingredient.measurement_unit)
+        for ingredient in Ingredient.objects.filter(pk__in=totals)
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('file_format', FORMATS)
+def test_download_headers(authorized_client, dataset, file_format):
+    response, content = download(authorized_client, file_format)
+    assert response['Content-Type'] == FORMATS[file_format][0]
+    assert response['Content-Disposition'] == (
+        f'attachment; filename={dataset.viewer.username}'
+        f'_shopping_list.{file_format}'
+    )
+    assert content
+
+
+@pytest.mark.django_db
+def test_download_txt(authorized_client, dataset):
+    _, content = download(authorized_client, 'txt')
+    header, *lines = content.decode().split('\n')
+    assert header == 'Список покупок:'
+    assert lines == [
+        f'{name} - {amount}, {unit}'
+        for name, amount, unit in expected_rows(dataset.viewer)
+    ]
+
+
+@pytest.mark.django_db
+def test_download_csv(authorized_client, dataset):
+    _, content = download(authorized_client, 'csv')
+    header, *rows = csv.reader(io.StringIO(content.decode()))
+    assert header == ['Ингредиент', 'Количество', 'Единица измерения']
+    assert rows == [list(row) for row in expected_rows(dataset.viewer)]
+
+
+@pytest.mark.django_db
+def test_download_pdf(authorized_client):
+    _, content = download(authorized_client, 'pdf')
+    assert content.startswith(b'%PDF')
+
+
+@pytest.mark.django_db
+def test_download_rejects_unknown_format(authorized_client):
+    response = authorized_client.get(URL, {'file_format': 'docx'})
+    assert response.status_code == 400
+    assert 'file_format' in response.json()
+
+
+@pytest.mark.django_db
+def test_download_requires_authentication(anonymous_client):
+    assert anonymous_client.get(URL).status_code == 401
+
+
+@pytest.mark.django_db
+def test_download_follows_cart_changes(authorized_client, dataset):
+    _, content = download(authorized_client, 'txt')
+    assert download(authorized_client, 'txt')[1] == content
+    ShoppingCart.objects.add_recipes(dataset.viewer, [dataset.recipe.pk])
+    _, changed = download(authorized_client, 'txt')
+    assert changed != content
+    assert changed.decode().split('\n')[1:] == [
+        f'{name} - {amount}, {unit}'
+        for name, amount, unit in expected_rows(dataset.viewer)
+    ]
@@ -0,0 +1,84 @@
+'''
+Приблизительное число объектов для больших выборок при пагинации.
+'''
+
+import pytest
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.pagination import EstimatedCountPaginator, get_count_cache_key
+from api.views import RecipeViewset
+from recipes.models import Recipe
+
+
+def get_count(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return response.json()['count'], len(context)
+
+
+@pytest.mark.django_db
+def test_large_count_is_cached(authorized_client, dataset, settings):
+    settings.ESTIMATED_COUNT_THRESHOLD = 2
+    first, first_queries = get_count(authorized_client, '/api/recipes/')
+    second, second_queries = get_count(authorized_client, '/api/recipes/')
+    assert first == second == Recipe.objects.count()
+    assert second_queries == first_queries - 1
+
+
+@pytest.mark.django_db
+def test_threshold_is_configured_per_view(authorized_client, dataset,
+                                          settings, monkeypatch):
+    settings.ESTIMATED_COUNT_THRESHOLD = 2
+    monkeypatch.setattr(
+        RecipeViewset, 'count_threshold', None, raising=False
+    )
+    first, first_queries = get_count(authorized_client, '/api/recipes/')
+    second, second_queries = get_count(authorized_client, '/api/recipes/')
+    assert first == second == Recipe.objects.count()
+    assert second_queries == first_queries
+
+
+@pytest.mark.django_db
+def test_small_sets_are_counted_exactly(dataset):
+    queryset = Recipe.objects.order_by('id')
+    paginator = EstimatedCountPaginator(
+        queryset, 2, threshold=queryset.count(), timeout=60
+    )
+    assert paginator.count == queryset.count()
+    assert not paginator.estimated
+
+
+@pytest.mark.django_db
+def test_pages_past_estimate_are_served(dataset, monkeypatch):
+    monkeypatch.setattr(
+        EstimatedCountPaginator, 'get_estimate', lambda self, queryset: 3
+    )
+    queryset = Recipe.objects.order_by('id')
+    paginator = EstimatedCountPaginator(queryset, 2, threshold=2, timeout=60)
+    assert paginator.count == 3
+    assert paginator.estimated
+    assert list(paginator.page(3)) == list(queryset[4:6])
+
+
+@pytest.mark.django_db
+def test_pages_past_exact_count_are_not_found(dataset):
+    queryset = Recipe.objects.order_by('id')
+    cache.set(get_count_cache_key(queryset.order_by().values('pk')), 3)
+    paginator = EstimatedCountPaginator(queryset, 2, threshold=2, timeout=60)
+    assert paginator.count == 3
+    assert not paginator.estimated
+    assert list(paginator.page(2)) == list(queryset[2:3])
+    with pytest.raises(EmptyPage):
+        paginator.page(3)
+
+
+@pytest.mark.django_db
+def test_page_past_the_end_is_not_found(authorized_client, dataset,
+                                        settings):
+    settings.ESTIMATED_COUNT_THRESHOLD = 2
+    response = authorized_client.get('/api/recipes/?page=99999')
+    assert response.status_code == 404
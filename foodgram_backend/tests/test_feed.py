@@ -0,0 +1,124 @@
+'''
+Лента подписок: рассылаемые авторы и авторы, читаемые при запросе.
+'''
+
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Subscribe, TimelineEntry
+from users.models import User
+
+
+@pytest.fixture
+def limits(settings):
+    settings.FEED_BACKFILL_LIMIT = 2
+    settings.FEED_TIMELINE_ROWS_LIMIT = 100
+
+
+def create_user(username):
+    return User.objects.create(
+        username=username, email=f'{username}@foodgram.ru',
+        first_name='Имя', last_name='Фамилия',
+    )
+
+
+def publish(author, count):
+    return [
+        Recipe.objects.create(
+            author=author, name=f'Рецепт {author.username} {number}',
+            text='Описание', image='recipes/images/recipe.png',
+            cooking_time=10,
+        )
+        for number in range(count)
+    ]
+
+
+def get_feed(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.get('/api/recipes/feed/', {'limit': 10})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def newest_first(recipes):
+    return [recipe.pk for recipe in sorted(
+        recipes, key=lambda recipe: (recipe.pub_date, recipe.pk),
+        reverse=True,
+    )]
+
+
+@pytest.mark.django_db
+def test_feed_merges_copied_and_pulled_recipes(limits):
+    reader = create_user('reader')
+    pushed = publish(create_user('pushed'), 1)
+    pulled = publish(create_user('pulled'), 3)
+    for recipes in (pushed, pulled):
+        Subscribe.objects.create(user=reader, author=recipes[0].author)
+    new = publish(pushed[0].author, 1)
+    assert set(reader.timeline.values_list('recipe', flat=True)) == {
+        recipe.pk for recipe in pushed + new
+    }
+    assert get_feed(reader) == newest_first(pushed + pulled + new)
+
+
+@pytest.mark.django_db
+def test_fan_out_is_bounded(settings, limits):
+    settings.FEED_TIMELINE_ROWS_LIMIT = 4
+    author = create_user('author')
+    readers = [create_user(f'reader{number}') for number in range(2)]
+    for reader in readers:
+        Subscribe.objects.create(user=reader, author=author)
+    recipes = publish(author, 1)
+    TimelineEntry.objects.fan_out(Recipe.objects.bulk_create([
+        Recipe(
+            author=author, name=f'Пачка {number}', text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10,
+        )
+        for number in range(2)
+    ]))
+    assert set(TimelineEntry.objects.filter(
+        recipe__author=author
+    ).values_list('recipe', flat=True)) == {recipes[0].pk}
+
+
+@pytest.mark.django_db
+def test_author_is_pushed_again_below_limits(limits):
+    reader = create_user('reader')
+    recipes = publish(create_user('author'), 3)
+    Subscribe.objects.create(user=reader, author=recipes[0].author)
+    assert not reader.timeline.exists()
+    recipes.pop().delete()
+    assert set(reader.timeline.values_list('recipe', flat=True)) == {
+        recipe.pk for recipe in recipes
+    }
+    assert get_feed(reader) == newest_first(recipes)
+
+
+@pytest.mark.django_db
+def test_recipes_published_in_pull_mode_are_backfilled(settings, limits):
+    settings.FEED_FANOUT_LIMIT = 3
+    author = create_user('author')
+    readers = [create_user(f'reader{number}') for number in range(3)]
+    for reader in readers:
+        Subscribe.objects.create(user=reader, author=author)
+    recipes = publish(author, 2)
+    assert not TimelineEntry.objects.filter(recipe__author=author).exists()
+    Subscribe.objects.filter(user=readers[0]).delete()
+    for reader in readers[1:]:
+        assert get_feed(reader) == newest_first(recipes)
+        assert reader.timeline.count() == len(recipes)
+
+
+@pytest.mark.django_db
+def test_deleting_several_recipes_pushes_author_again(limits):
+    reader = create_user('reader')
+    recipes = publish(create_user('author'), 4)
+    Subscribe.objects.create(user=reader, author=recipes[0].author)
+    assert not reader.timeline.exists()
+    Recipe.objects.filter(
+        pk__in=[recipe.pk for recipe in recipes[2:]]
+    ).delete()
+    assert set(reader.timeline.values_list('recipe', flat=True)) == {
+        recipe.pk for recipe in recipes[:2]
+    }
@@ -0,0 +1,24 @@
+'''
+Генерация синтетического набора данных.
+'''
+
+import io
+import re
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Tag
+
+COLOR = re.compile(r'^#[0-9a-f]{6}$')
+
+
+@pytest.mark.django_db
+def test_generated_tags_have_valid_colors(dataset):
+    call_command(
+        'generate_data', users=3, recipes=5, tags=4, seed=1,
+        stdout=io.StringIO(),
+    )
+    tags = Tag.objects.filter(slug__startswith='synthetic1_')
+    assert tags.count() == 4
+    assert all(COLOR.match(tag.color) for tag in tags)
@@ -0,0 +1,67 @@
+'''
+Уменьшенные копии изображений рецептов.
+'''
+
+import pytest
+from PIL import Image
+
+from recipes.images import (get_formats, render_variants, save_variants,
+                            schedule_recipe_image)
+from recipes.models import Recipe
+
+VARIANTS = {'card': (100, 100), 'detail': (400, 400)}
+
+
+def create_image(media_root, name, size=(1000, 500)):
+    path = media_root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new('RGBA', size, (200, 100, 50, 255)).save(path, 'PNG')
+    return name
+
+
+def test_render_variants(tmp_path):
+    name = create_image(tmp_path, 'recipes/images/soup.png')
+    formats = get_formats()
+    result = render_variants(str(tmp_path), name, VARIANTS, formats)
+    folder = 'recipes/images/variants'
+    assert result == {
+        variant: {
+            image_format: f'{folder}/soup_{variant}.{image_format}'
+            for image_format in formats
+        }
+        for variant in VARIANTS
+    }
+    for variant, size in (('card', (100, 50)), ('detail', (400, 200))):
+        for variant_name in result[variant].values():
+            with Image.open(tmp_path / variant_name) as image:
+                assert image.size == size
+
+
+@pytest.mark.django_db
+def test_variants_of_replaced_image_are_dropped(dataset):
+    recipe = Recipe.objects.get(pk=dataset.recipe.pk)
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image='recipes/images/new.png'
+    )
+    save_variants(recipe, {'card': {'jpeg': 'old_card.jpeg'}})
+    assert Recipe.objects.get(pk=recipe.pk).image_variants == {}
+    recipe.refresh_from_db()
+    save_variants(recipe, {'card': {'jpeg': 'new_card.jpeg'}})
+    assert Recipe.objects.get(pk=recipe.pk).image_variants == {
+        'card': {'jpeg': 'new_card.jpeg'}
+    }
+
+
+@pytest.mark.django_db
+def test_variants_are_built_after_commit(
+    dataset, settings, tmp_path, django_capture_on_commit_callbacks
+):
+    settings.IMAGE_PROCESSING_WORKERS = 0
+    settings.RECIPE_IMAGE_VARIANTS = VARIANTS
+    recipe = Recipe.objects.get(pk=dataset.recipe.pk)
+    recipe.image = create_image(tmp_path, 'recipes/images/stew.png')
+    recipe.save()
+    with django_capture_on_commit_callbacks(execute=True):
+        schedule_recipe_image(recipe)
+    recipe.refresh_from_db()
+    assert set(recipe.image_variants) == set(VARIANTS)
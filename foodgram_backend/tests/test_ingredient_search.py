@@ -0,0 +1,71 @@
+'''
+Поиск ингредиентов по префиксу и с опечатками из индекса в памяти.
+'''
+
+import pytest
+
+from api.search import ingredient_index
+from recipes.models import Ingredient
+
+NAMES = (
+    'Молоко', 'Молоко топленое', 'Молочный шоколад',
+    'Сахар', 'Сахарная пудра', 'Соль',
+)
+
+
+@pytest.fixture
+def ingredients(dataset):
+    created = [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in NAMES
+    ]
+    yield created
+    ingredient_index.invalidate()
+
+
+def search(client, name):
+    response = client.get('/api/ingredients/', {'name': name})
+    assert response.status_code == 200
+    return [ingredient['name'] for ingredient in response.json()]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, expected', (
+    ('молоко', ['Молоко', 'Молоко топленое']),
+    ('МОЛ', ['Молоко', 'Молоко топленое', 'Молочный шоколад']),
+    ('  сахар  ', ['Сахар', 'Сахарная пудра']),
+    ('сахарная   пудра', ['Сахарная пудра']),
+))
+def test_prefix_matches_shortest_first(anonymous_client, ingredients, name,
+                                       expected):
+    assert search(anonymous_client, name) == expected
+
+
+@pytest.mark.django_db
+def test_typo_falls_back_to_trigrams(anonymous_client, ingredients):
+    assert search(anonymous_client, 'малоко')[0] == 'Молоко'
+    assert search(anonymous_client, 'сохар')[0] == 'Сахар'
+
+
+@pytest.mark.django_db
+def test_miss_returns_empty_list(anonymous_client, ingredients):
+    assert search(anonymous_client, 'йцукен') == []
+
+
+@pytest.mark.django_db
+def test_results_are_limited(anonymous_client, ingredients, settings):
+    settings.INGREDIENT_SEARCH_LIMIT = 2
+    assert search(anonymous_client, 'ингредиент') == [
+        'ингредиент 0', 'ингредиент 1'
+    ]
+
+
+@pytest.mark.django_db
+def test_payload_and_new_ingredients(anonymous_client, ingredients):
+    response = anonymous_client.get('/api/ingredients/', {'name': 'соль'})
+    salt = ingredients[-1]
+    assert response.json() == [
+        {'id': salt.pk, 'name': 'Соль', 'measurement_unit': 'г'}
+    ]
+    Ingredient.objects.create(name='Соль морская', measurement_unit='г')
+    assert search(anonymous_client, 'соль') == ['Соль', 'Соль морская']
@@ -0,0 +1,63 @@
+'''
+Быстрые JSON-рендерер и парсер дают тот же результат, что и DRF.
+'''
+
+import datetime
+import decimal
+import io
+import uuid
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+
+from api.parsers import JSONParser
+from api.renderers import JSONRenderer
+
+DATA = {
+    'name': 'Борщ с пампушками',
+    'created': datetime.datetime(
+        2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc
+    ),
+    'date': datetime.date(2024, 1, 2),
+    'amount': decimal.Decimal('1.50'),
+    'uuid': uuid.UUID(int=1),
+    'lazy': gettext_lazy('Рецепт'),
+    'nested': [1, 2.5, None, True, ('a', 'b')],
+    1: 'числовой ключ',
+}
+
+
+def test_renderer_output_matches_drf():
+    assert JSONRenderer().render(DATA) == renderers.JSONRenderer().render(
+        DATA
+    )
+
+
+def test_renderer_indent_falls_back_to_drf():
+    media_type = 'application/json; indent=4'
+    assert JSONRenderer().render(DATA, media_type) == (
+        renderers.JSONRenderer().render(DATA, media_type)
+    )
+
+
+@pytest.mark.django_db
+def test_recipe_list_matches_drf(anonymous_client, dataset):
+    response = anonymous_client.get('/api/recipes/')
+    assert response.content == renderers.JSONRenderer().render(
+        response.json()
+    )
+
+
+def test_parser_matches_drf():
+    content = renderers.JSONRenderer().render(DATA)
+    assert JSONParser().parse(io.BytesIO(content)) == (
+        parsers.JSONParser().parse(io.BytesIO(content))
+    )
+
+
+@pytest.mark.parametrize('content', (b'{"a": ', b'{"a": NaN}'))
+def test_parser_rejects_invalid_json(content):
+    with pytest.raises(ParseError):
+        JSONParser().parse(io.BytesIO(content))
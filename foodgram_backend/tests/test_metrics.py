@@ -0,0 +1,119 @@
+'''
+Метрики маршрутов в формате Prometheus и их сумма по процессам.
+'''
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from api.metrics import EXITED_FILENAME, prune_exited, registry
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(settings):
+    registry.reset()
+    return Path(settings.METRICS_DIR)
+
+
+def get_metrics(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    return response.content.decode()
+
+
+def get_value(metrics, prefix):
+    return float(next(
+        line.rsplit(' ', 1)[1] for line in metrics.splitlines()
+        if line.startswith(prefix)
+    ))
+
+
+@pytest.mark.django_db
+def test_recipe_list_is_measured(anonymous_client, dataset):
+    anonymous_client.get('/api/recipes/')
+    anonymous_client.get('/api/recipes/')
+    metrics = get_metrics(anonymous_client)
+    labels = 'view="RecipeViewset.list",method="GET"'
+    assert get_value(
+        metrics,
+        f'foodgram_request_duration_seconds_count{{{labels},status="200"}}',
+    ) == 2
+    assert get_value(
+        metrics, f'foodgram_request_db_queries_sum{{{labels}}}'
+    ) > 0
+    assert get_value(
+        metrics,
+        'foodgram_serializer_duration_seconds_total'
+        f'{{{labels},serializer="RecipeListSerializer"}}',
+    ) > 0
+
+
+@pytest.mark.django_db
+def test_unknown_urls_share_one_label(anonymous_client, dataset):
+    anonymous_client.get('/api/missing/1/')
+    anonymous_client.get('/api/missing/2/')
+    metrics = get_metrics(anonymous_client)
+    assert get_value(
+        metrics,
+        'foodgram_request_duration_seconds_count'
+        '{view="unmatched",method="GET",status="404"}',
+    ) == 2
+
+
+@pytest.mark.django_db
+def test_metrics_of_other_processes_are_summed(anonymous_client, dataset,
+                                               metrics_dir):
+    labels = [['view', 'RecipeViewset.list'], ['method', 'GET']]
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    (metrics_dir / '1-other.json').write_text(json.dumps({
+        'counters': [
+            ['foodgram_db_query_duration_seconds_total', labels, 1.5],
+        ],
+        'histograms': [],
+    }))
+    anonymous_client.get('/api/recipes/')
+    metrics = get_metrics(anonymous_client)
+    assert get_value(
+        metrics,
+        'foodgram_db_query_duration_seconds_total'
+        '{view="RecipeViewset.list",method="GET"}',
+    ) > 1.5
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+@pytest.mark.django_db
+def test_files_of_exited_processes_are_merged(anonymous_client, dataset,
+                                              metrics_dir):
+    labels = [['view', 'RecipeViewset.list'], ['method', 'GET']]
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    for number in range(2):
+        (metrics_dir / f'{exited_pid()}-{number}.json').write_text(
+            json.dumps({
+                'counters': [
+                    ['foodgram_db_query_duration_seconds_total', labels, 1.5],
+                ],
+                'histograms': [],
+            })
+        )
+    anonymous_client.get('/api/recipes/')
+    metrics = get_metrics(anonymous_client)
+    prefix = (
+        'foodgram_db_query_duration_seconds_total'
+        '{view="RecipeViewset.list",method="GET"}'
+    )
+    total = get_value(metrics, prefix)
+    assert total > 3
+    assert sorted(path.name for path in metrics_dir.glob('*.json')) == [
+        registry.filename, EXITED_FILENAME
+    ]
+    prune_exited()
+    assert get_value(get_metrics(anonymous_client), prefix) == total
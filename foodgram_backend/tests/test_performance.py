@@ -0,0 +1,208 @@
+'''
+Бюджеты числа SQL-запросов и времени ответа для всех маршрутов API.
+
+Бюджет запросов равен текущему числу запросов: лишний запрос от
+сериализатора или фильтра (N+1) валит тест. Если запросов стало
+меньше, бюджет стоит уменьшить вместе с изменением.
+'''
+
+import time
+
+import pytest
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+TIME_BUDGET = 0.5
+
+
+def recipe_payload(data):
+    return {
+        'name': 'Новый рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'image': IMAGE,
+        'tags': [data.tag.id],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in data.ingredients[:10]
+        ],
+    }
+
+
+def bulk_payload(data):
+    return [recipe_payload(data) for _ in range(5)]
+
+
+def batch_payload(data):
+    return {'recipes': [
+        data.recipe.id, data.own_recipe.id, data.favorite.id, data.in_cart.id
+    ]}
+
+
+def patch_payload(data):
+    return {
+        'name': 'Измененный рецепт',
+        'tags': [data.tag.id],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 5}
+            for ingredient in data.ingredients[5:15]
+        ],
+    }
+
+
+# (метод, адрес, тело запроса,
+#  (статус, запросов) для анонима, (статус, запросов) для пользователя)
+ROUTES = {
+    'user-list': (
+        'get', '/api/users/', None, (200, 2), (200, 4)),
+    'user-detail': (
+        'get', '/api/users/{data.author.id}/', None, (200, 1), (200, 3)),
+    'user-me': (
+        'get', '/api/users/me/', None, (401, 0), (200, 2)),
+    'user-create': (
+        'post', '/api/users/',
+        {'email': 'new@foodgram.ru', 'username': 'newuser',
+         'first_name': 'Имя', 'last_name': 'Фамилия',
+         'password': 'Secret-password-1'},
+        (201, 5), (201, 6)),
+    'user-set-password': (
+        'post', '/api/users/set_password/',
+        {'current_password': 'wrong', 'new_password': 'Secret-password-2'},
+        (401, 0), (400, 1)),
+    'subscriptions': (
+        'get', '/api/users/subscriptions/?recipes_limit=3', None,
+        (401, 0), (200, 4)),
+    'subscribe': (
+        'post', '/api/users/{data.author.id}/subscribe/?recipes_limit=3',
+        None, (401, 0), (201, 10)),
+    'unsubscribe': (
+        'delete', '/api/users/{data.followed.id}/subscribe/', None,
+        (401, 0), (204, 6)),
+    'tag-list': (
+        'get', '/api/tags/', None, (200, 1), (200, 2)),
+    'tag-detail': (
+        'get', '/api/tags/{data.tag.id}/', None, (200, 1), (200, 2)),
+    'ingredient-list': (
+        'get', '/api/ingredients/', None, (200, 1), (200, 2)),
+    'ingredient-search': (
+        'get', '/api/ingredients/?name=ингр', None, (200, 1), (200, 1)),
+    'ingredient-detail': (
+        'get', '/api/ingredients/{data.ingredient.id}/', None,
+        (200, 1), (200, 2)),
+    'recipe-list': (
+        'get', '/api/recipes/', None, (200, 5), (200, 7)),
+    'recipe-list-filtered': (
+        'get', '/api/recipes/?tags=breakfast&tags=lunch'
+        '&author={data.author.id}', None, (200, 7), (200, 9)),
+    'recipe-list-favorited': (
+        'get', '/api/recipes/?is_favorited=1', None, (200, 2), (200, 7)),
+    'recipe-list-in-cart': (
+        'get', '/api/recipes/?is_in_shopping_cart=1', None,
+        (200, 2), (200, 7)),
+    'recipe-list-compact': (
+        'get', '/api/recipes/?fields=name,image,cooking_time', None,
+        (200, 3), (200, 5)),
+    'recipe-detail-compact': (
+        'get', '/api/recipes/{data.recipe.id}/?fields=name,author', None,
+        (200, 2), (200, 4)),
+    'recipe-list-popular': (
+        'get', '/api/recipes/?ordering=popular', None, (200, 5), (200, 7)),
+    'recipe-search': (
+        'get', '/api/recipes/?search=рецепт', None, (200, 5), (200, 7)),
+    'recipe-list-cursor': (
+        'get', '/api/recipes/?pagination=cursor', None, (200, 4), (200, 6)),
+    'recipe-feed': (
+        'get', '/api/recipes/feed/', None, (401, 0), (200, 7)),
+    'recipe-detail': (
+        'get', '/api/recipes/{data.recipe.id}/', None, (200, 4), (200, 6)),
+    'recipe-create': (
+        'post', '/api/recipes/', recipe_payload, (401, 0), (201, 11)),
+    'recipe-bulk-create': (
+        'post', '/api/recipes/bulk/', bulk_payload, (401, 0), (201, 21)),
+    'recipe-update': (
+        'patch', '/api/recipes/{data.own_recipe.id}/', patch_payload,
+        (401, 0), (200, 17)),
+    'recipe-delete': (
+        'delete', '/api/recipes/{data.own_recipe.id}/', None,
+        (401, 0), (204, 11)),
+    'favorite-add': (
+        'post', '/api/recipes/{data.recipe.id}/favorite/', None,
+        (401, 0), (201, 8)),
+    'favorite-remove': (
+        'delete', '/api/recipes/{data.favorite.id}/favorite/', None,
+        (401, 0), (204, 6)),
+    'shopping-cart-add': (
+        'post', '/api/recipes/{data.recipe.id}/shopping_cart/', None,
+        (401, 0), (201, 12)),
+    'shopping-cart-remove': (
+        'delete', '/api/recipes/{data.in_cart.id}/shopping_cart/', None,
+        (401, 0), (204, 9)),
+    'favorite-batch-add': (
+        'post', '/api/recipes/favorite/', batch_payload, (401, 0), (201, 7)),
+    'favorite-batch-remove': (
+        'delete', '/api/recipes/favorite/', batch_payload,
+        (401, 0), (204, 7)),
+    'shopping-cart-batch-add': (
+        'post', '/api/recipes/shopping_cart/', batch_payload,
+        (401, 0), (201, 11)),
+    'shopping-cart-batch-remove': (
+        'delete', '/api/recipes/shopping_cart/', batch_payload,
+        (401, 0), (204, 10)),
+    'download-shopping-cart-txt': (
+        'get', '/api/recipes/download_shopping_cart/', None,
+        (401, 0), (200, 3)),
+    'download-shopping-cart-csv': (
+        'get', '/api/recipes/download_shopping_cart/?file_format=csv', None,
+        (401, 0), (200, 3)),
+    'download-shopping-cart-pdf': (
+        'get', '/api/recipes/download_shopping_cart/?file_format=pdf', None,
+        (401, 0), (200, 3)),
+    'token-login': (
+        'post', '/api/auth/token/login/',
+        {'email': 'user1@foodgram.ru', 'password': 'wrong'},
+        (400, 1), (400, 2)),
+    'token-logout': (
+        'post', '/api/auth/token/logout/', None, (401, 0), (204, 2)),
+}
+
+
+def request(client, method, url, payload):
+    started = time.perf_counter()
+    response = getattr(client, method)(url, payload, format='json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response, time.perf_counter() - started
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('user', ('anonymous', 'authorized'))
+@pytest.mark.parametrize('route', ROUTES)
+def test_route_budget(request_factory_client, user, route, dataset,
+                      django_assert_max_num_queries):
+    method, url, payload, *budgets = ROUTES[route]
+    status, max_queries = budgets[user == 'authorized']
+    client = request_factory_client(user)
+    if callable(payload):
+        payload = payload(dataset)
+    with django_assert_max_num_queries(max_queries):
+        response, elapsed = request(
+            client, method, url.format(data=dataset), payload
+        )
+    assert response.status_code == status, (
+        f'{route}: ожидался статус {status}, получен '
+        f'{response.status_code}.'
+    )
+    assert elapsed < TIME_BUDGET, (
+        f'{route}: ответ за {elapsed:.3f} с, бюджет {TIME_BUDGET} с.'
+    )
+
+
+@pytest.fixture
+def request_factory_client(anonymous_client, authorized_client):
+    return {
+        'anonymous': anonymous_client,
+        'authorized': authorized_client,
+    }.get
@@ -0,0 +1,63 @@
+'''
+Изменение рецепта меняет только изменившиеся теги и ингредиенты.
+'''
+
+import pytest
+
+from recipes.models import Recipe, RecipeIngredient, ShoppingCart
+from .test_shopping_list import expected_shopping_list, shopping_list
+
+
+def ingredient_rows(recipe):
+    return {
+        row.ingredient_id: (row.pk, row.amount)
+        for row in RecipeIngredient.objects.filter(recipe=recipe)
+    }
+
+
+@pytest.mark.django_db
+def test_patch_changes_only_changed_ingredients(authorized_client, dataset):
+    recipe = dataset.own_recipe
+    ShoppingCart.objects.add_recipes(dataset.author, [recipe.pk])
+    before = ingredient_rows(recipe)
+    kept, changed, removed, *rest = before
+    added = next(
+        ingredient.pk for ingredient in dataset.ingredients
+        if ingredient.pk not in before
+    )
+    ingredients = [
+        {'id': kept, 'amount': before[kept][1]},
+        {'id': changed, 'amount': before[changed][1] + 1},
+        {'id': added, 'amount': 7},
+    ] + [{'id': pk, 'amount': before[pk][1]} for pk in rest]
+    tags = list(recipe.tags.values_list('pk', flat=True))
+    through = Recipe.tags.through.objects.filter(recipe=recipe)
+    tag_rows = dict(through.values_list('tag_id', 'pk'))
+    response = authorized_client.patch(
+        f'/api/recipes/{recipe.pk}/',
+        {'ingredients': ingredients, 'tags': tags},
+        format='json',
+    )
+    assert response.status_code == 200
+    after = ingredient_rows(recipe)
+    assert after[kept] == before[kept]
+    assert after[changed] == (before[changed][0], before[changed][1] + 1)
+    assert removed not in after
+    assert after[added][1] == 7
+    assert all(after[pk] == before[pk] for pk in rest)
+    assert dict(through.values_list('tag_id', 'pk')) == tag_rows
+    assert shopping_list(dataset.author) == (
+        expected_shopping_list(dataset.author)
+    )
+
+
+@pytest.mark.django_db
+def test_patch_without_ingredients_keeps_rows(authorized_client, dataset):
+    recipe = dataset.own_recipe
+    before = ingredient_rows(recipe)
+    response = authorized_client.patch(
+        f'/api/recipes/{recipe.pk}/', {'name': 'Новое название'},
+        format='json',
+    )
+    assert response.status_code == 200
+    assert ingredient_rows(recipe) == before
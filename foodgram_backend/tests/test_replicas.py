@@ -0,0 +1,124 @@
+'''
+Маршрутизация чтения в реплики и возврат к основной БД после записи.
+'''
+
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.replicas import (STICKY_COOKIE, ReplicaRouter, replica_middleware,
+                          replica_reads)
+from recipes.models import Recipe
+
+
+@pytest.fixture(autouse=True)
+def replicas(settings):
+    settings.REPLICA_DATABASES = ['replica1']
+
+
+@pytest.fixture
+def replica_database(db, settings, tmp_path):
+    """
+    Вторая настоящая БД SQLite — снимок основной, который не получает
+    последующих записей, как отстающая реплика.
+    """
+    connections.databases['replica1'] = {
+        **connections.databases['default'],
+        'NAME': str(tmp_path / 'replica.sqlite3'),
+        'TEST': {},
+    }
+    replica = connections['replica1']
+    replica.ensure_connection()
+    connections['default'].connection.backup(replica.connection)
+    yield replica
+    replica.close()
+    del connections['replica1']
+    del connections.databases['replica1']
+
+
+def view(request):
+    response = HttpResponse()
+    response.reads_replica = replica_reads.get()
+    return response
+
+
+def send(method, path, cookies=None):
+    request = getattr(RequestFactory(), method)(path)
+    request.COOKIES.update(cookies or {})
+    return replica_middleware(view)(request)
+
+
+def reads_replica(method, path, cookies=None):
+    return send(method, path, cookies).reads_replica
+
+
+def write(path='/api/recipes/'):
+    response = send('post', path)
+    return {STICKY_COOKIE: response.cookies[STICKY_COOKIE].value}
+
+
+async def async_reads_replica(request):
+    return replica_reads.get()
+
+
+def test_async_stack_uses_replica():
+    middleware = replica_middleware(async_reads_replica)
+    assert asyncio.iscoroutinefunction(middleware)
+    request = RequestFactory().get('/api/recipes/')
+    assert async_to_sync(middleware)(request)
+    assert replica_reads.get() is False
+
+
+def test_router_reads_recipes_from_replica():
+    router = ReplicaRouter()
+    token = replica_reads.set(True)
+    try:
+        assert router.db_for_read(Recipe) == 'replica1'
+        assert router.db_for_read(Token) is None
+        assert router.db_for_write(Recipe) == 'default'
+    finally:
+        replica_reads.reset(token)
+    assert router.db_for_read(Recipe) is None
+    assert router.allow_migrate('replica1', 'recipes') is False
+
+
+def test_safe_api_requests_use_replica():
+    assert reads_replica('get', '/api/recipes/')
+    assert not reads_replica('get', '/admin/')
+    assert not reads_replica('post', '/api/recipes/')
+
+
+def test_reads_stick_to_primary_after_write():
+    cookies = write()
+    assert not reads_replica('get', '/api/recipes/', cookies)
+    assert reads_replica('get', '/api/recipes/')
+
+
+def test_forged_or_expired_marker_is_ignored(settings):
+    assert reads_replica('get', '/api/recipes/', {STICKY_COOKIE: '1'})
+    cookies = write()
+    settings.REPLICA_STICKY_TIMEOUT = -1
+    assert reads_replica('get', '/api/recipes/', cookies)
+
+
+def test_replicas_are_not_used_without_configuration(settings):
+    settings.REPLICA_DATABASES = []
+    assert not reads_replica('get', '/api/recipes/')
+
+
+def test_reads_switch_between_databases(replica_database, dataset):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {dataset.token}')
+    url = f'/api/recipes/{dataset.recipe.pk}/'
+    assert not client.get(url).data['is_favorited']
+    response = client.post(f'{url}favorite/')
+    assert response.status_code == 201
+    assert client.get(url).data['is_favorited']
+    client.cookies.clear()
+    assert not client.get(url).data['is_favorited']
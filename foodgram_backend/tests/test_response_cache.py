@@ -0,0 +1,310 @@
+'''
+Кэш ответов анонимным пользователям, его точечный сброс
+и условные запросы (ETag, Last-Modified).
+'''
+
+import gzip
+import json
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+
+from recipes.models import Recipe, RecipeIngredient
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+@pytest.fixture(autouse=True)
+def anonymous_cache(settings):
+    """Кэш ответов анонимам работает только с общим кэшем процессов."""
+    settings.ANONYMOUS_CACHE = True
+
+
+def page_of(recipe, queryset=Recipe.objects):
+    """Номер страницы списка, на которой находится рецепт."""
+    ids = list(queryset.values_list('pk', flat=True))
+    return ids.index(recipe.pk) // settings.REST_FRAMEWORK['PAGE_SIZE'] + 1
+
+
+def get_twice(client, url, django_assert_num_queries):
+    first = client.get(url)
+    with django_assert_num_queries(0):
+        second = client.get(url)
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    return second
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', (
+    '/api/recipes/',
+    '/api/recipes/?tags=lunch&tags=breakfast&page=2',
+    '/api/recipes/{data.recipe.id}/',
+))
+def test_repeated_request_served_from_cache(anonymous_client, dataset, url,
+                                            django_assert_num_queries):
+    get_twice(
+        anonymous_client, url.format(data=dataset), django_assert_num_queries
+    )
+
+
+@pytest.mark.django_db
+def test_process_local_cache_disables_anonymous_cache(
+    anonymous_client, dataset, settings, django_assert_num_queries
+):
+    settings.ANONYMOUS_CACHE = False
+    url = f'/api/recipes/{dataset.recipe.id}/'
+    anonymous_client.get(url)
+    with django_assert_num_queries(4):
+        assert anonymous_client.get(url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_params_are_normalized(anonymous_client, dataset,
+                               django_assert_num_queries):
+    anonymous_client.get('/api/recipes/?tags=lunch&tags=breakfast&page=1')
+    with django_assert_num_queries(0):
+        anonymous_client.get(
+            '/api/recipes/?page=1&tags=breakfast&tags=lunch&utm=1'
+        )
+
+
+@pytest.mark.django_db
+def test_authorized_requests_are_not_cached(anonymous_client,
+                                            authorized_client, dataset):
+    url = '/api/recipes/?is_favorited=1'
+    assert anonymous_client.get(url).json()['results'] == []
+    results = authorized_client.get(url).json()['results']
+    assert results and all(item['is_favorited'] for item in results)
+
+
+@pytest.mark.django_db
+def test_recipe_change_drops_only_affected_entries(
+    anonymous_client, dataset, django_assert_num_queries,
+    django_capture_on_commit_callbacks
+):
+    recipe = dataset.recipe
+    other = Recipe.objects.exclude(author=recipe.author).first()
+    urls = {
+        'detail': f'/api/recipes/{recipe.id}/',
+        'list': f'/api/recipes/?page={page_of(recipe)}',
+        'author': f'/api/recipes/?author={recipe.author.id}&page='
+                  f'{page_of(recipe, recipe.author.recipes)}',
+        'other_detail': f'/api/recipes/{other.id}/',
+        'other_author': f'/api/recipes/?author={other.author.id}',
+    }
+    for url in urls.values():
+        anonymous_client.get(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.name = 'Новое название'
+        recipe.save()
+    for name in ('other_detail', 'other_author'):
+        with django_assert_num_queries(0):
+            anonymous_client.get(urls[name])
+    assert anonymous_client.get(urls['detail']).json()['name'] == recipe.name
+    for name in ('list', 'author'):
+        names = [
+            item['name']
+            for item in anonymous_client.get(urls[name]).json()['results']
+        ]
+        assert recipe.name in names
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('change', ('tag', 'ingredient', 'author'))
+def test_related_change_drops_recipe_detail(
+    anonymous_client, dataset, change, django_capture_on_commit_callbacks
+):
+    recipe = dataset.recipe
+    url = f'/api/recipes/{recipe.id}/'
+    anonymous_client.get(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        if change == 'tag':
+            tag = recipe.tags.first()
+            tag.name = 'Новый тег'
+            tag.save()
+        elif change == 'ingredient':
+            item = RecipeIngredient.objects.filter(recipe=recipe).first()
+            item.amount += 1
+            item.save()
+        else:
+            recipe.author.first_name = 'Новое имя'
+            recipe.author.save()
+    data = anonymous_client.get(url).json()
+    if change == 'tag':
+        assert 'Новый тег' in [tag['name'] for tag in data['tags']]
+    elif change == 'ingredient':
+        amounts = {row['id']: row['amount'] for row in data['ingredients']}
+        assert amounts[item.ingredient_id] == item.amount
+    else:
+        assert data['author']['first_name'] == 'Новое имя'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url, queries', (
+    ('/api/recipes/{data.recipe.id}/', 3),
+    ('/api/recipes/?tags=lunch', 4),
+))
+def test_not_modified_without_serialization(authorized_client, dataset, url,
+                                            queries,
+                                            django_assert_num_queries):
+    url = url.format(data=dataset)
+    etag = authorized_client.get(url)['ETag']
+    with django_assert_num_queries(queries):
+        response = authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert not response.has_header('Last-Modified')
+
+
+@pytest.mark.django_db
+def test_anonymous_revalidation(anonymous_client, dataset,
+                                django_assert_num_queries):
+    url = f'/api/recipes/{dataset.recipe.id}/'
+    response = anonymous_client.get(url)
+    with django_assert_num_queries(0):
+        assert anonymous_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code == 304
+        assert anonymous_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        ).status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', (
+    '/api/recipes/{data.recipe.id}/',
+    '/api/recipes/?tags=lunch&page=2',
+))
+def test_changes_update_validators(authorized_client, dataset, url,
+                                   django_capture_on_commit_callbacks):
+    url = url.format(data=dataset)
+    etag = authorized_client.get(url)['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        authorized_client.post(
+            f'/api/recipes/{dataset.recipe.id}/favorite/'
+        )
+    response = authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    etag = response['ETag']
+    tag = dataset.recipe.tags.first()
+    tag.name = 'Новое название'
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.save()
+    response = authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_list_validators_follow_data(authorized_client, dataset):
+    """
+    ETag списка вычисляется по данным, а не по кэшу процесса: его
+    меняют и изменения без сигналов (другой процесс, update()).
+    """
+    url = f'/api/recipes/?author={dataset.author.id}'
+    etag = authorized_client.get(url)['ETag']
+    assert authorized_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+    Recipe.objects.filter(pk=dataset.recipe.pk).update(
+        updated_at=timezone.now()
+    )
+    response = authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    etag = response['ETag']
+    Recipe.objects.filter(
+        author=dataset.author
+    ).exclude(pk=dataset.recipe.pk).first().delete()
+    response = authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_counter_change_drops_cached_responses(
+    anonymous_client, authorized_client, dataset,
+    django_capture_on_commit_callbacks
+):
+    recipe = dataset.recipe
+    urls = (
+        f'/api/recipes/{recipe.id}/',
+        f'/api/recipes/?author={recipe.author.id}&page='
+        f'{page_of(recipe, recipe.author.recipes)}',
+    )
+    for url in urls:
+        anonymous_client.get(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert authorized_client.post(
+            f'/api/recipes/{recipe.id}/favorite/'
+        ).status_code == 201
+    recipe.refresh_from_db()
+    detail, author = (anonymous_client.get(url).json() for url in urls)
+    assert detail['favorites_count'] == recipe.favorites_count
+    assert {
+        item['id']: item['favorites_count'] for item in author['results']
+    }[recipe.id] == recipe.favorites_count
+    popular = anonymous_client.get('/api/recipes/?ordering=popular').json()
+    top = Recipe.objects.popular().values_list('pk', flat=True)[:6]
+    assert [item['id'] for item in popular['results']] == list(top)
+
+
+@pytest.mark.django_db
+def test_loading_tags_drops_cached_reference_data(
+    anonymous_client, dataset, tmp_path, monkeypatch
+):
+    anonymous_client.get('/api/tags/')
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'tag.csv').write_text(
+        'Полдник,#ffcc00,snack\n', encoding='utf-8'
+    )
+    monkeypatch.chdir(tmp_path)
+    call_command('load_tags')
+    tags = anonymous_client.get('/api/tags/').json()
+    assert 'snack' in [tag['slug'] for tag in tags]
+
+
+def decode(response):
+    content = response.content
+    encoding = response.get('Content-Encoding')
+    if encoding == 'gzip':
+        content = gzip.decompress(content)
+    elif encoding == 'br':
+        content = brotli.decompress(content)
+    return json.loads(content)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('accept_encoding, encoding', (
+    ('', None),
+    ('deflate, gzip', 'gzip'),
+    ('gzip, br', 'br'),
+))
+def test_reference_data_encodings(anonymous_client, dataset,
+                                  accept_encoding, encoding,
+                                  django_assert_num_queries):
+    if encoding == 'br' and brotli is None:
+        pytest.skip('brotli не установлен')
+    url = '/api/tags/'
+    identity = anonymous_client.get(url)
+    response = anonymous_client.get(
+        url, HTTP_ACCEPT_ENCODING=accept_encoding
+    )
+    assert response.get('Content-Encoding') == encoding
+    assert 'Accept-Encoding' in response['Vary']
+    assert decode(response) == identity.json()
+    assert (response['ETag'] == identity['ETag']) == (encoding is None)
+    with django_assert_num_queries(0):
+        assert anonymous_client.get(
+            url, HTTP_ACCEPT_ENCODING=accept_encoding,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        ).status_code == 304
+    if encoding is not None:
+        assert anonymous_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'],
+        ).status_code == 200
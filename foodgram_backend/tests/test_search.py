@@ -0,0 +1,52 @@
+'''
+Полнотекстовый поиск рецептов: релевантность, фильтры и переиндексация.
+'''
+
+import pytest
+
+from recipes.models import Recipe
+
+
+def create_recipe(author, name, text='Описание'):
+    return Recipe.objects.create(
+        author=author, name=name, text=text,
+        image='recipes/images/recipe.png', cooking_time=10,
+    )
+
+
+def search(client, query, **params):
+    response = client.get('/api/recipes/', {'search': query, **params})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_name_matches_rank_above_text_matches(anonymous_client, dataset):
+    in_name = create_recipe(dataset.viewer, 'Квазиборщ домашний')
+    in_text = create_recipe(dataset.author, 'Суп', 'Настоящий квазиборщ')
+    assert search(anonymous_client, 'квазиборщ') == [in_name.pk, in_text.pk]
+    assert search(anonymous_client, 'квазиборщ домашний') == [in_name.pk]
+
+
+@pytest.mark.django_db
+def test_search_combines_with_filters(anonymous_client, dataset):
+    tagged = create_recipe(dataset.author, 'Квазиборщ с тегом')
+    tagged.tags.add(dataset.tag)
+    other = create_recipe(dataset.viewer, 'Квазиборщ без тега')
+    assert search(
+        anonymous_client, 'квазиборщ', tags=dataset.tag.slug
+    ) == [tagged.pk]
+    assert search(
+        anonymous_client, 'квазиборщ', author=dataset.viewer.pk
+    ) == [other.pk]
+
+
+@pytest.mark.django_db
+def test_edited_recipe_is_reindexed(anonymous_client, dataset):
+    recipe = create_recipe(dataset.author, 'Квазиборщ')
+    recipe.name = 'Квазищи'
+    recipe.save()
+    assert search(anonymous_client, 'квазиборщ') == []
+    assert search(anonymous_client, 'квазищи') == [recipe.pk]
+    Recipe.objects.filter(pk=recipe.pk).update(text='Квазирассольник')
+    assert search(anonymous_client, 'квазирассольник') == [recipe.pk]
@@ -0,0 +1,71 @@
+'''
+Список покупок совпадает с суммой ингредиентов рецептов в корзине.
+'''
+
+import io
+from collections import Counter
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import (Favorite, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem)
+from users.models import User
+
+
+def expected_shopping_list(user):
+    totals = Counter()
+    for ingredient_id, amount in RecipeIngredient.objects.filter(
+        recipe__shopping__user=user
+    ).values_list('ingredient_id', 'amount'):
+        totals[ingredient_id] += amount
+    return dict(totals)
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(
+        user=user
+    ).values_list('ingredient_id', 'amount'))
+
+
+@pytest.mark.django_db
+def test_shopping_lists_match_carts(dataset):
+    users = User.objects.filter(shopping__isnull=False).distinct()
+    lists = {user.pk: shopping_list(user) for user in users}
+    assert lists == {
+        user.pk: expected_shopping_list(user) for user in users
+    }
+    call_command('rebuild_shopping_lists', stdout=io.StringIO())
+    assert lists == {user.pk: shopping_list(user) for user in users}
+
+
+@pytest.mark.django_db
+def test_batch_add_counts_each_recipe_once(dataset):
+    recipe = Recipe.objects.get(pk=dataset.recipe.pk)
+    assert Favorite.objects.add_recipes(
+        dataset.viewer, [recipe.pk, recipe.pk]
+    ) == [recipe.pk]
+    assert Favorite.objects.add_recipes(dataset.viewer, [recipe.pk]) == []
+    assert Recipe.objects.get(pk=recipe.pk).favorites_count == (
+        recipe.favorites_count + 1
+    )
+
+
+@pytest.mark.django_db
+def test_cart_changes_keep_shopping_list(dataset):
+    viewer, recipe = dataset.viewer, dataset.recipe
+    ShoppingCart.objects.add_recipes(viewer, [recipe.pk])
+    assert shopping_list(viewer) == expected_shopping_list(viewer)
+    assert set(ShoppingCart.objects.remove_recipes(
+        viewer, [recipe.pk, dataset.in_cart.pk]
+    )) == {recipe.pk, dataset.in_cart.pk}
+    assert shopping_list(viewer) == expected_shopping_list(viewer)
+
+
+@pytest.mark.django_db
+def test_deleted_recipe_leaves_shopping_lists(dataset):
+    recipe = dataset.in_cart
+    users = list(recipe.shopping.values_list('user', flat=True))
+    recipe.delete()
+    for user in users:
+        assert shopping_list(user) == expected_shopping_list(user)
@@ -0,0 +1,42 @@
+'''
+Параметр fields: ответ и выборка только с запрошенными полями.
+'''
+
+import pytest
+
+
+@pytest.mark.django_db
+def test_list_contains_only_requested_fields(authorized_client, dataset):
+    response = authorized_client.get(
+        '/api/recipes/?fields=name, cooking_time,is_favorited'
+    )
+    assert response.status_code == 200
+    for item in response.json()['results']:
+        assert set(item) == {'id', 'name', 'cooking_time', 'is_favorited'}
+
+
+@pytest.mark.django_db
+def test_detail_contains_only_requested_fields(anonymous_client, dataset):
+    response = anonymous_client.get(
+        f'/api/recipes/{dataset.recipe.id}/?fields=author,tags'
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {'id', 'author', 'tags'}
+    assert data['author']['id'] == dataset.recipe.author_id
+
+
+@pytest.mark.django_db
+def test_unknown_field_is_rejected(anonymous_client, dataset):
+    response = anonymous_client.get('/api/recipes/?fields=name,password')
+    assert response.status_code == 400
+    assert 'fields' in response.json()
+
+
+@pytest.mark.django_db
+def test_compact_and_full_responses_are_cached_separately(anonymous_client,
+                                                          dataset):
+    compact = anonymous_client.get('/api/recipes/?fields=name').json()
+    full = anonymous_client.get('/api/recipes/').json()
+    assert set(compact['results'][0]) == {'id', 'name'}
+    assert 'ingredients' in full['results'][0]
@@ -0,0 +1,104 @@
+'''
+Подписки: recipes_limit, recipes_count и is_subscribed в ответах.
+'''
+
+import pytest
+
+from recipes.models import Recipe
+from users.models import User
+
+
+def all_results(client, url, params=None):
+    """Результаты всех страниц списка."""
+    results = []
+    response = client.get(url, params)
+    while True:
+        assert response.status_code == 200
+        data = response.json()
+        results += data['results']
+        if not data['next']:
+            return results
+        response = client.get(data['next'])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipes_limit, limit', (
+    (None, None), ('0', 0), ('2', 2), ('100', 100), ('abc', None),
+))
+def test_subscriptions_payload(authorized_client, dataset, recipes_limit,
+                               limit):
+    params = {} if recipes_limit is None else {'recipes_limit': recipes_limit}
+    response = authorized_client.get('/api/users/subscriptions/', params)
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [item['id'] for item in results] == list(
+        dataset.viewer.subscriber.order_by('id').values_list(
+            'author_id', flat=True
+        )
+    )
+    for item in results:
+        author = User.objects.get(pk=item['id'])
+        assert item['username'] == author.username
+        assert item['is_subscribed'] is True
+        recipes = {
+            recipe.pk: recipe
+            for recipe in Recipe.objects.filter(author=author)
+        }
+        assert item['recipes_count'] == len(recipes)
+        returned = [recipe['id'] for recipe in item['recipes']]
+        expected = len(recipes) if limit is None else min(limit, len(recipes))
+        assert len(returned) == expected
+        assert set(returned) <= recipes.keys()
+        dates = [recipes[pk].pub_date for pk in returned]
+        assert dates == sorted(dates, reverse=True)
+        rest = [
+            recipe.pub_date for pk, recipe in recipes.items()
+            if pk not in returned
+        ]
+        assert not rest or not dates or min(dates) >= max(rest)
+
+
+@pytest.mark.django_db
+def test_is_subscribed_in_user_list(anonymous_client, authorized_client,
+                                    dataset):
+    followed = set(
+        dataset.viewer.subscriber.values_list('author_id', flat=True)
+    )
+    users = all_results(authorized_client, '/api/users/')
+    assert len(users) == User.objects.count()
+    assert {
+        user['id'] for user in users if user['is_subscribed']
+    } == followed
+    anonymous = all_results(anonymous_client, '/api/users/')
+    assert not any(user['is_subscribed'] for user in anonymous)
+
+
+@pytest.mark.django_db
+def test_is_subscribed_in_recipe_author(authorized_client, dataset):
+    followed = dataset.followed
+    recipe = followed.recipes.first()
+    data = authorized_client.get(f'/api/recipes/{recipe.pk}/').json()
+    assert data['author']['id'] == followed.pk
+    assert data['author']['is_subscribed'] is True
+    data = authorized_client.get(f'/api/recipes/{dataset.recipe.pk}/').json()
+    assert data['author']['is_subscribed'] is False
+
+
+@pytest.mark.django_db
+def test_subscribe_response(authorized_client, dataset):
+    author = dataset.author
+    response = authorized_client.post(
+        f'/api/users/{author.pk}/subscribe/', {'recipes_limit': 2}
+    )
+    assert response.status_code == 201
+    repeated = authorized_client.post(f'/api/users/{author.pk}/subscribe/')
+    assert repeated.status_code == 400
+    item = next(
+        item for item in all_results(
+            authorized_client, '/api/users/subscriptions/',
+            {'recipes_limit': 1},
+        )
+        if item['id'] == author.pk
+    )
+    assert item['recipes_count'] == author.recipes.count()
+    assert len(item['recipes']) == 1
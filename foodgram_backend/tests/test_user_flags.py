@@ -0,0 +1,84 @@
+'''
+Флаги is_favorited и is_in_shopping_cart в списке и деталях рецептов.
+'''
+
+import pytest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def flags(user):
+    return (
+        set(Favorite.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        )),
+        set(ShoppingCart.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        )),
+    )
+
+
+def all_results(client, url):
+    results = []
+    while url:
+        data = client.get(url).json()
+        results += data['results']
+        url = data['next']
+    return results
+
+
+@pytest.mark.django_db
+def test_anonymous_flags_are_false(anonymous_client, dataset):
+    recipes = anonymous_client.get('/api/recipes/').json()['results']
+    recipes.append(
+        anonymous_client.get(f'/api/recipes/{dataset.favorite.pk}/').json()
+    )
+    assert recipes
+    for recipe in recipes:
+        assert recipe['is_favorited'] is False
+        assert recipe['is_in_shopping_cart'] is False
+
+
+@pytest.mark.django_db
+def test_authorized_flags_match_user_rows(authorized_client, dataset):
+    favorites, cart = flags(dataset.viewer)
+    recipes = all_results(authorized_client, '/api/recipes/')
+    assert len(recipes) == Recipe.objects.count()
+    assert {
+        recipe['id'] for recipe in recipes if recipe['is_favorited']
+    } == favorites
+    assert {
+        recipe['id'] for recipe in recipes if recipe['is_in_shopping_cart']
+    } == cart
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('param, index', (
+    ('is_favorited', 0), ('is_in_shopping_cart', 1),
+))
+def test_flag_filters(authorized_client, dataset, param, index):
+    recipes = all_results(authorized_client, f'/api/recipes/?{param}=1')
+    assert {recipe['id'] for recipe in recipes} == flags(dataset.viewer)[index]
+    assert all(recipe[param] for recipe in recipes)
+
+
+@pytest.mark.django_db
+def test_detail_flags_follow_changes(authorized_client, dataset):
+    url = f'/api/recipes/{dataset.recipe.pk}/'
+    data = authorized_client.get(url).json()
+    assert data['is_favorited'] is False
+    assert data['is_in_shopping_cart'] is False
+    authorized_client.post(f'{url}favorite/')
+    authorized_client.post(f'{url}shopping_cart/')
+    data = authorized_client.get(url).json()
+    assert data['is_favorited'] is True
+    assert data['is_in_shopping_cart'] is True
+    favorites, cart = flags(dataset.viewer)
+    for recipe_id in favorites:
+        assert authorized_client.get(
+            f'/api/recipes/{recipe_id}/'
+        ).json()['is_favorited'] is True
+    for recipe_id in cart:
+        assert authorized_client.get(
+            f'/api/recipes/{recipe_id}/'
+        ).json()['is_in_shopping_cart'] is True